@@ -0,0 +1,17 @@
+# Dictionary of known airlines with their IDs, shared by conversation mining
+# (creating_conversations.py) and the airline mode of the loader
+KNOWN_AIRLINES = {
+    'KLM': 106062176,
+    'AirFrance': 106062176,
+    'British_Airways': 18332190,
+    'AmericanAir': 22536055,
+    'Lufthansa': 124476322,
+    'AirBerlin': 26223583,
+    'AirBerlin_assist': 2182373406,
+    'easyJet': 38676903,
+    'RyanAir': 1542862735,
+    'SingaporeAir': 253340062,
+    'Qantas': 218730857,
+    'EtihadAirways': 45621423,
+    'VirginAtlantic': 20626359
+}
@@ -10,6 +10,7 @@ from db_repository import (
 )
 from tqdm import tqdm
 from collections import defaultdict
+from airlines import KNOWN_AIRLINES
 
 # Set up logging
 logging.basicConfig(
@@ -18,22 +19,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Dictionary of known airlines with their IDs
-KNOWN_AIRLINES = {
-    'KLM': 106062176,
-    'AirFrance': 106062176,
-    'British_Airways': 18332190,
-    'AmericanAir': 22536055,
-    'Lufthansa': 124476322,
-    'AirBerlin': 26223583,
-    'AirBerlin_assist': 2182373406,
-    'easyJet': 38676903,
-    'RyanAir': 1542862735,
-    'SingaporeAir': 253340062,
-    'Qantas': 218730857,
-    'EtihadAirways': 45621423,
-    'VirginAtlantic': 20626359
-}
 
 def fetch_conversation_components(conn, airline_id):
     """
@@ -215,7 +200,7 @@ def format_conversation(conn, user_id, root_id, tweet_ids):
             t.text,
             u.screen_name,
             t.in_reply_to_status_id
-        FROM tweet t
+        FROM tweet_full t
         JOIN [user] u ON t.user_id = u.id
         WHERE t.id IN ({placeholders})
         ORDER BY t.created_at
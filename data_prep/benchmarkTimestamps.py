@@ -0,0 +1,60 @@
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+from completeLoading import convert_timestamp, parse_twitter_timestamp
+
+# Micro-benchmark for the timestamp decoding of the tweets stage.
+# Compares the old strptime/strftime round trip with the slice parser,
+# with and without memoization of repeated second-resolution strings.
+
+SAMPLE_SIZE = 200_000
+TWEETS_PER_SECOND = 5  # Roughly how often the same timestamp repeats in our dumps
+
+
+def make_timestamps(count, per_second):
+    """Build Twitter style timestamps where every second occurs per_second times."""
+    start = datetime(2019, 12, 1)
+    return [(start + timedelta(seconds=i // per_second)).strftime("%a %b %d %H:%M:%S +0000 %Y")
+            for i in range(count)]
+
+
+def strptime_round_trip(ts):
+    """The previous implementation of convert_timestamp for Twitter strings."""
+    dt = datetime.strptime(ts, "%a %b %d %H:%M:%S +0000 %Y")
+    return dt.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def run_benchmark(timestamps, repeat=3):
+    """Time every decoder over the sample and return the best time per decoder."""
+    uncached = parse_twitter_timestamp.__wrapped__
+
+    def cached(ts):
+        return convert_timestamp(ts)
+
+    decoders = {
+        'strptime + strftime': strptime_round_trip,
+        'slice parser': uncached,
+        'slice parser + cache': cached,
+    }
+
+    # The fast paths must agree with strptime
+    for ts in timestamps[:1000]:
+        assert uncached(ts) == datetime.strptime(ts, "%a %b %d %H:%M:%S +0000 %Y")
+
+    results = {}
+    for name, decoder in decoders.items():
+        parse_twitter_timestamp.cache_clear()
+        results[name] = min(timeit.repeat(lambda: [decoder(ts) for ts in timestamps], number=1, repeat=repeat))
+    return results
+
+
+if __name__ == "__main__":
+    sample_size = int(sys.argv[1]) if len(sys.argv) > 1 else SAMPLE_SIZE
+    timestamps = make_timestamps(sample_size, TWEETS_PER_SECOND)
+    results = run_benchmark(timestamps)
+
+    baseline = results['strptime + strftime']
+    print(f"Decoding {sample_size:,} timestamps ({TWEETS_PER_SECOND} per second):")
+    for name, seconds in results.items():
+        print(f"  {name:<22} {seconds * 1000:8.1f} ms  {sample_size / seconds:12,.0f} /s  {baseline / seconds:5.1f}x")
@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+
+script_directory = os.path.dirname(__file__)
+sys.path.append(os.path.join(script_directory, '..'))
+
+from completeLoading import open_connection, get_tweet_text_layout
+from db_repository import get_tweet_volume_over_time, get_language_counts
+from creating_conversations import fetch_conversation_components
+from airlines import KNOWN_AIRLINES
+
+# Benchmark for the tweet text layouts. Times the scans that never read the
+# text (tweet volume per day, language counts and the conversation component
+# UNION) and reports how many pages dbo.tweet and dbo.tweet_text occupy.
+# Run it once, move the text with `completeLoading.py --tweet-text split`
+# (or `compressed`) and run it again to compare the layouts.
+#
+# With --cold the buffer pool is emptied before every run, so the timings
+# include reading the pages from disk; this needs sysadmin rights.
+
+REPEAT = 3
+AIRLINE = 'AmericanAir'
+
+
+def table_pages(cursor):
+    """In-row and LOB pages of the tweet tables, in MB."""
+    cursor.execute("""
+        SELECT OBJECT_NAME(object_id),
+               SUM(in_row_used_page_count) * 8 / 1024.0,
+               SUM(lob_used_page_count) * 8 / 1024.0
+        FROM sys.dm_db_partition_stats
+        WHERE object_id IN (OBJECT_ID('dbo.tweet'), OBJECT_ID('dbo.tweet_text'))
+        GROUP BY object_id
+    """)
+    return cursor.fetchall()
+
+
+def run_benchmark(conn, cold=False, repeat=REPEAT):
+    """Time every scan and return the best time per scan."""
+    airline_id = KNOWN_AIRLINES[AIRLINE]
+    scans = {
+        'tweet volume over time': lambda: get_tweet_volume_over_time(conn),
+        'language counts': lambda: get_language_counts(conn),
+        f'conversation components ({AIRLINE})': lambda: fetch_conversation_components(conn, airline_id),
+    }
+
+    results = {}
+    for name, scan in scans.items():
+        timings = []
+        for _ in range(repeat):
+            if cold:
+                conn.execute("CHECKPOINT; DBCC DROPCLEANBUFFERS WITH NO_INFOMSGS;")
+            start = time.perf_counter()
+            scan()
+            timings.append(time.perf_counter() - start)
+        results[name] = min(timings)
+    return results
+
+
+if __name__ == "__main__":
+    cold = '--cold' in sys.argv[1:]
+    conn, cursor = open_connection()
+    conn.autocommit = True
+
+    print(f"Tweet text layout: {get_tweet_text_layout(cursor)}")
+    for table, in_row_mb, lob_mb in table_pages(cursor):
+        print(f"  {table:<12} {in_row_mb:10,.1f} MB in-row  {lob_mb:10,.1f} MB LOB")
+
+    results = run_benchmark(conn, cold)
+    print(f"Best of {REPEAT} runs ({'cold' if cold else 'warm'} buffer pool):")
+    for name, seconds in results.items():
+        print(f"  {name:<40} {seconds * 1000:10.1f} ms")
+    conn.close()
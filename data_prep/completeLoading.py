@@ -1,60 +1,564 @@
 import os
+import io
 import json
+import gzip
+import bz2
+import lzma
+import argparse
+import hashlib
+import mmap
+import array
+import struct
+import sqlite3
 import pyodbc
 import sys
+import math
+import time
+import multiprocessing
+import threading
+import queue
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
 from datetime import datetime, timezone
 from tqdm import tqdm
-from collections import defaultdict
+
+# Optional faster JSON decoders, used automatically when installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+# Optional Zstandard support for .json.zst archives
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 # Ensure the terminal uses UTF-8 encoding for output
 sys.stdout.reconfigure(encoding='utf-8')
 
 # Define the directory containing the JSON files dynamically
 script_directory = os.path.dirname(__file__)
+
+# Shared modules live in the project root
+sys.path.append(os.path.join(script_directory, '..'))
+from tweet_store import (
+    pa, ds, store_directory, tweet_store_schema, store_partitioning,
+    open_tweet_store, date_filter, store_file_version, STORE_VERSION
+)
+from issue_keywords import text_features
+from airlines import KNOWN_AIRLINES
 data_directory = os.path.join(script_directory, '..', 'data')
 log_directory = os.path.join(script_directory, '..', 'logs')
+cold_archive_directory = os.path.join(script_directory, '..', 'cold_archive')
 os.makedirs(log_directory, exist_ok=True)
 
 server = 'S20203142'
 database = 'airline_tweets'
 BATCH_SIZE = 1000  # Process tweets in batches for memory efficiency
+QUEUE_SIZE = 16  # Maximum number of parsed batches waiting per writer in parallel mode
+CHUNK_BYTES = 256 * 1024 * 1024  # Uncompressed files larger than this are split into chunks in parallel mode
+PIPELINE = False  # Overlap reading, parsing and database writes with threads in single-pass mode
+PIPELINE_QUEUE_SIZE = 4  # Maximum number of chunks waiting between two pipeline stages
+WRITER_SHARDS = 1  # Database connections writing the tweet and entity stages, sharded by tweet id
+SHARD_STOP_TIMEOUT = 60  # Seconds to wait for each shard writer thread after a failed stage
+WRITE_RETRIES = 3  # Times a parallel writer replays its open transaction after a deadlock or key race
+BULK_MERGE = False  # Load users and tweets through staging tables with one MERGE per batch
+DECODER = 'auto'  # JSON decoder backend: 'auto', 'json', 'orjson' or 'simdjson'
+USER_CACHE = True  # Skip users whose row is unchanged since it was last written
+TWEET_FILTER = True  # Skip tweets that are already loaded and unchanged, using a Bloom filter
+BLOOM_CAPACITY = 20_000_000  # Expected number of distinct tweet rows in the Bloom filter
+BLOOM_ERROR_RATE = 0.001  # Target false positive rate at that capacity
+ADAPTIVE_BATCHES = False  # Size batches and commits per table from measured round-trip latency
+BATCH_TARGET_SECONDS = 0.25  # Target duration of one batch round trip in adaptive mode
+COMMIT_TARGET_SECONDS = 5.0  # Target duration of the work between two commits in adaptive mode
+BATCH_MEMORY_LIMIT = 64 * 1024 * 1024  # Maximum estimated bytes buffered per table in adaptive mode
+MIN_BATCH_SIZE = 100
+MAX_BATCH_SIZE = 50_000
+HASH_SAMPLE_BYTES = 1024 * 1024  # Bytes hashed at the start and the end of a file for its manifest entry
+WATCH_SETTLE_SECONDS = 60  # Files modified more recently than this are assumed to be still arriving
+
+# Module settings that the command line can change; they are handed to
+# worker processes explicitly because those re-import the module
+LOADER_SETTINGS = ['BATCH_SIZE', 'BULK_MERGE', 'DECODER', 'USER_CACHE', 'TWEET_FILTER', 'data_directory']
 
 # Connect to SQL Server using Microsoft Authentication
 connection_string = f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};DATABASE={database};Trusted_Connection=yes;"
-connection = pyodbc.connect(connection_string)
-cursor = connection.cursor()
+
+def get_loader_settings():
+    """Collect the current loader settings so they can be passed to worker processes."""
+    return {name: globals()[name] for name in LOADER_SETTINGS}
+
+def apply_loader_settings(settings):
+    """Apply loader settings received from the main process."""
+    globals().update(settings)
+    select_decoder(DECODER)
+
+def open_connection():
+    """Open a new database connection and cursor."""
+    conn = pyodbc.connect(connection_string)
+    return conn, conn.cursor()
+
+# The connection is opened in the main block, so worker processes that
+# re-import this module for parsing do not each open a database session
+connection = None
+cursor = None
 
 # Progress tracking log paths
-progress_log_path = os.path.join(log_directory, 'loading_progress.log')
+checkpoint_journal_path = os.path.join(log_directory, 'loading_checkpoints.journal')
+legacy_progress_log_path = os.path.join(log_directory, 'loading_progress.log')
 summary_log_path = os.path.join(log_directory, 'loading_summary.log')
+batch_tuning_log_path = os.path.join(log_directory, 'batch_tuning.log')
+manifest_path = os.path.join(log_directory, 'ingest_manifest.json')
+telemetry_path = os.path.join(log_directory, 'loading_telemetry.jsonl')
+user_cache_path = os.path.join(log_directory, 'user_row_cache.sqlite')
+tweet_bloom_path = os.path.join(log_directory, 'tweet_rows.bloom')
+
+# Counters reported in the summary log at the end of a run
+load_stats = Counter()
+
+# Shard writer threads count into their own Counter and keep their own pending
+# Bloom bits (see shard_writer), so one shard's commit never publishes rows that
+# another shard has not committed yet. Their counters are merged into load_stats
+# by the coordinating thread with every commit acknowledgement.
+shard_state = threading.local()
+
+def run_stats():
+    """Counters of the current shard writer thread, or of the process."""
+    return getattr(shard_state, 'stats', load_stats)
+
+# Run telemetry, written as JSON lines to loading_telemetry.jsonl: one 'batch'
+# event per commit and one 'file' event per finished file or chunk, each with
+# lines/s, bytes/s and how much of the time was spent in the database, plus a
+# 'run' event with the totals. Database latencies are counted in power-of-two
+# millisecond buckets in load_stats, so parallel writers can send theirs back
+# with the other counters.
+run_started = time.perf_counter()
+run_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+telemetry_marks = {}
+
+def write_telemetry(event, **fields):
+    """Append one telemetry event."""
+    record = {'run': run_id, 'time': datetime.now().isoformat(timespec='seconds'), 'event': event}
+    record.update(fields)
+    with open(telemetry_path, 'a', encoding='utf8') as telemetry_file:
+        telemetry_file.write(json.dumps(record) + '\n')
+
+def record_latency(name, seconds, rows=0):
+    """Count a database round trip in the latency histogram of a table (or 'commit')."""
+    milliseconds = seconds * 1000
+    bucket = 1 if milliseconds <= 1 else 2 ** math.ceil(math.log2(milliseconds))
+    stats = run_stats()
+    stats[f"latency:{name}:{bucket}"] += 1
+    stats[f"rows:{name}"] += rows
+    stats['db_seconds'] += seconds
+
+def telemetry_start(key, stage, offset, line_number):
+    """Remember where a file or chunk starts, as the base of its telemetry events."""
+    mark = {'time': time.perf_counter(), 'offset': offset, 'line': line_number, 'db_seconds': load_stats['db_seconds']}
+    telemetry_marks[(key, stage)] = {'start': mark, 'last': dict(mark)}
+
+def telemetry_checkpoint(key, stage, offset, line_number, done=False):
+    """
+    Write a batch event for the work since the previous checkpoint of a file, and
+    a file event for the whole file when it is done. Time outside the database
+    is reading and parsing; in parallel mode the database time of the writer
+    processes is only known at the end of the run.
+    """
+    marks = telemetry_marks.get((key, stage))
+    if marks is None:
+        return
+    now = time.perf_counter()
+    events = [('batch', marks['last'])] + ([('file', marks['start'])] if done else [])
+    for event, mark in events:
+        seconds = max(now - mark['time'], 1e-9)
+        lines = line_number - mark['line']
+        byte_count = offset - mark['offset']
+        db_seconds = load_stats['db_seconds'] - mark['db_seconds']
+        write_telemetry(event, file=key, stage=STAGE_NAMES[stage], lines=lines, bytes=byte_count,
+                        seconds=round(seconds, 4), lines_per_second=round(lines / seconds, 1),
+                        bytes_per_second=round(byte_count / seconds), db_seconds=round(db_seconds, 4),
+                        parse_seconds=round(max(seconds - db_seconds, 0), 4))
+    marks['last'] = {'time': now, 'offset': offset, 'line': line_number, 'db_seconds': load_stats['db_seconds']}
+    if done:
+        load_stats['telemetry_lines'] += line_number - marks['start']['line']
+        load_stats['telemetry_bytes'] += offset - marks['start']['offset']
+        del telemetry_marks[(key, stage)]
+
+def latency_percentile(name, fraction):
+    """Upper bound in ms of the histogram bucket holding a latency percentile."""
+    buckets = sorted((int(key.rsplit(':', 1)[1]), count) for key, count in load_stats.items()
+                     if key.startswith(f"latency:{name}:"))
+    total = sum(count for _, count in buckets)
+    seen = 0
+    for bucket, count in buckets:
+        seen += count
+        if seen >= total * fraction:
+            return bucket
+    return 0
 
-# Initialize progress tracking dictionary with three stages per file:
+def log_telemetry_summary():
+    """Summarise the run telemetry on screen, in the summary log and as a 'run' event."""
+    elapsed = time.perf_counter() - run_started
+    lines = load_stats['telemetry_lines']
+    byte_count = load_stats['telemetry_bytes']
+    tables = {}
+    for name in ('user', 'tweet', *ENTITY_EXTRACTORS, 'commit'):
+        round_trips = sum(count for key, count in load_stats.items() if key.startswith(f"latency:{name}:"))
+        if not round_trips:
+            continue
+        tables[name] = {
+            'round_trips': round_trips,
+            'rows': load_stats[f"rows:{name}"],
+            'p50_ms': latency_percentile(name, 0.5),
+            'p95_ms': latency_percentile(name, 0.95),
+            'p99_ms': latency_percentile(name, 0.99),
+            'inserted': load_stats[f"inserted:{name}"],
+            'updated': load_stats[f"updated:{name}"]
+        }
+    write_telemetry('run', seconds=round(elapsed, 2), lines=lines, bytes=byte_count,
+                    lines_per_second=round(lines / elapsed, 1), bytes_per_second=round(byte_count / elapsed),
+                    db_seconds=round(load_stats['db_seconds'], 2), tables=tables)
+    
+    message = (f"Throughput: {lines} lines, {byte_count / 1024 / 1024:,.1f} MB in {elapsed:.1f}s "
+               f"({lines / elapsed:,.0f} lines/s, {byte_count / 1024 / 1024 / elapsed:,.1f} MB/s), "
+               f"{load_stats['db_seconds']:.1f}s in the database")
+    print(message)
+    log_summary(message)
+    for name, table in tables.items():
+        message = (f"  {name}: {table['round_trips']} round trips, {table['rows']} rows, "
+                   f"p50 <= {table['p50_ms']} ms, p95 <= {table['p95_ms']} ms, p99 <= {table['p99_ms']} ms")
+        if table['inserted'] or table['updated']:
+            message += f", {table['inserted']} inserted, {table['updated']} updated"
+        print(message)
+        log_summary(message)
+
+# Processing stages per file:
 # stage 1: users, stage 2: tweets, stage 3: entities
-progress = defaultdict(lambda: {1: 0, 2: 0, 3: 0})
+# stage 0 is used by the single-pass mode, which loads all three at once
+# stage 4 is the single pass restricted to airline-relevant tweets
+# stage 5 is the conversion of a file to the Parquet tweet store
+AIRLINE_STAGE = 4
+PARQUET_STAGE = 5
+STAGE_NAMES = {0: "all", 1: "users", 2: "tweets", 3: "entities", AIRLINE_STAGE: "airline", PARQUET_STAGE: "parquet"}
+
+# Raw and compressed tweet dumps that can be loaded directly
+DATA_FILE_EXTENSIONS = ('.json', '.json.gz', '.json.bz2', '.json.xz', '.json.zst')
+
+def is_data_file(filename):
+    """Check whether a file in the data directory is a (possibly compressed) tweet dump."""
+    if filename.endswith('.json.zst') and zstandard is None:
+        return False
+    return filename.endswith(DATA_FILE_EXTENSIONS)
+
+def data_file_base_name(json_file):
+    """Name of a data file without its .json or compressed .json.* extension."""
+    for extension in DATA_FILE_EXTENSIONS:
+        if json_file.endswith(extension):
+            return json_file[:-len(extension)]
+    return json_file
+
+@contextmanager
+def open_data_file(json_file):
+    """
+    Open a data file for reading binary lines, decompressing it on the fly.
+    
+    Yields:
+        tuple: (stream, raw) where stream yields the decompressed lines and raw is
+        the file on disk, whose position tells how many stored bytes were read
+    """
+    raw = open(os.path.join(data_directory, json_file), 'rb')
+    stream = raw
+    try:
+        if json_file.endswith('.gz'):
+            stream = gzip.GzipFile(fileobj=raw)
+        elif json_file.endswith('.bz2'):
+            stream = bz2.BZ2File(raw)
+        elif json_file.endswith('.xz'):
+            stream = lzma.LZMAFile(raw)
+        elif json_file.endswith('.zst'):
+            stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw))
+        yield stream, raw
+    finally:
+        if stream is not raw:
+            stream.close()
+        raw.close()
+
+# Parallel mode splits large uncompressed files into newline-aligned byte ranges.
+# Every chunk is checkpointed on its own under the key "<file>@<start>-<end>".
+# The ranges only depend on the file content and CHUNK_BYTES, so a resumed run
+# finds the same chunks again.
+def chunk_key(json_file, start, end):
+    """Checkpoint key of a byte range of a data file."""
+    return f"{json_file}@{start}-{end}"
+
+def split_chunk_key(key):
+    """
+    Split a checkpoint key into the data file and its byte range.
+    
+    Returns:
+        tuple: (json_file, (start, end)), or (key, None) for a whole file
+    """
+    json_file, separator, byte_range = key.rpartition('@')
+    start, _, end = byte_range.partition('-')
+    if not separator or not start.isdigit() or not end.isdigit():
+        return key, None
+    return json_file, (int(start), int(end))
+
+def split_file_ranges(json_file):
+    """
+    Split an uncompressed data file into byte ranges of about CHUNK_BYTES that
+    start right after a newline.
+    
+    Returns:
+        list: (start, end) tuples covering the whole file
+    """
+    path = os.path.join(data_directory, json_file)
+    size = os.path.getsize(path)
+    if size == 0:
+        return [(0, 0)]
+    
+    boundaries = [0]
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for index in range(1, math.ceil(size / CHUNK_BYTES)):
+            newline = mapped.find(b'\n', max(index * CHUNK_BYTES, boundaries[-1]))
+            if newline == -1 or newline + 1 >= size:
+                break
+            boundaries.append(newline + 1)
+    boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+@contextmanager
+def open_line_range(json_file, offset, end=None):
+    """
+    Open the lines of a data file from a byte offset. With an end offset the
+    (uncompressed) file is memory-mapped and only the lines that start before
+    end are returned, so workers share the OS page cache instead of each
+    reading their own copy.
+    """
+    if end is None:
+        with open_data_file(json_file) as (file, _):
+            seek_data_stream(file, offset)
+            yield file
+        return
+    
+    with open(os.path.join(data_directory, json_file), 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            mapped.seek(offset)
+            
+            def lines():
+                while mapped.tell() < end:
+                    line = mapped.readline()
+                    if not line:
+                        break
+                    yield line
+            
+            yield lines()
+
+def seek_data_stream(stream, offset):
+    """
+    Move a data stream to a decompressed byte offset. Compressed formats have no
+    index, so this decompresses up to the offset without writing anything to disk.
+    """
+    if stream.seekable():
+        stream.seek(offset)
+        return
+    while offset > 0:
+        chunk = stream.read(min(offset, 1024 * 1024))
+        if not chunk:
+            break
+        offset -= len(chunk)
+
+# Checkpoints are kept in an append-only journal with one tab separated record
+# per commit: file, stage, byte offset, line number, file size, file mtime (ns)
+# and a done flag. For compressed files the offset is a position in the
+# decompressed stream. The last record for a (file, stage) pair wins, and records
+# whose size and mtime no longer match the file on disk are ignored.
+checkpoints = {}
+
+def file_fingerprint(json_file):
+    """Return (size, mtime in ns) of a data file (or of the file of a chunk key), used to detect changed files."""
+    stat = os.stat(os.path.join(data_directory, split_chunk_key(json_file)[0]))
+    return stat.st_size, stat.st_mtime_ns
+
+def parse_checkpoint_record(line):
+    """Parse one journal line into ((file, stage), checkpoint) or None if it is torn."""
+    parts = line.rstrip('\n').split('\t')
+    if len(parts) != 7:
+        return None
+    filename, stage, offset, line_number, size, mtime, done = parts
+    try:
+        return (filename, int(stage)), {
+            'offset': int(offset),
+            'line': int(line_number),
+            'fingerprint': (int(size), int(mtime)),
+            'done': done == '1'
+        }
+    except ValueError:
+        return None
+
+def format_checkpoint_record(key, checkpoint):
+    """Format a checkpoint as one journal line."""
+    size, mtime = checkpoint['fingerprint']
+    return (f"{key[0]}\t{key[1]}\t{checkpoint['offset']}\t{checkpoint['line']}\t"
+            f"{size}\t{mtime}\t{int(checkpoint['done'])}\n")
+
+# Load the existing checkpoints if the journal exists
+if os.path.exists(checkpoint_journal_path):
+    with open(checkpoint_journal_path, 'r', encoding='utf8') as journal:
+        for record in journal:
+            parsed = parse_checkpoint_record(record)
+            if parsed:
+                checkpoints[parsed[0]] = parsed[1]
+
+def get_checkpoint(json_file, stage):
+    """
+    Get the committed position for a file and stage.
+    
+    Returns:
+        tuple: (byte offset, line number, done), or (0, 0, False) when there is
+        no checkpoint or the file changed since it was written
+    """
+    checkpoint = checkpoints.get((json_file, stage))
+    if not checkpoint or checkpoint['fingerprint'] != file_fingerprint(json_file):
+        return 0, 0, False
+    return checkpoint['offset'], checkpoint['line'], checkpoint['done']
+
+def record_checkpoint(json_file, stage, offset, line_number, done=False):
+    """Append a committed position for a file and stage to the checkpoint journal."""
+    key = (json_file, stage)
+    checkpoints[key] = {
+        'offset': offset,
+        'line': line_number,
+        'fingerprint': file_fingerprint(json_file),
+        'done': done
+    }
+    with open(checkpoint_journal_path, 'a', encoding='utf8') as journal:
+        journal.write(format_checkpoint_record(key, checkpoints[key]))
+        journal.flush()
+        os.fsync(journal.fileno())
+
+def is_stage_complete(json_file, stage):
+    """Check from the journal alone whether a stage finished an unchanged file."""
+    return get_checkpoint(json_file, stage)[2]
+
+def compact_checkpoint_journal():
+    """Rewrite the journal with only the latest record per file and stage."""
+    if not os.path.exists(checkpoint_journal_path):
+        return
+    temp_path = checkpoint_journal_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf8') as journal:
+        for key, checkpoint in checkpoints.items():
+            journal.write(format_checkpoint_record(key, checkpoint))
+        journal.flush()
+        os.fsync(journal.fileno())
+    os.replace(temp_path, checkpoint_journal_path)
 
-# Load the existing progress if the log exists
-if os.path.exists(progress_log_path):
-    with open(progress_log_path, 'r') as log_file:
+def migrate_legacy_progress():
+    """
+    Convert the old line-number loading_progress.log into journal records once.
+    The byte offset of every recorded line is found with a single scan of the file.
+    """
+    if os.path.exists(checkpoint_journal_path) or not os.path.exists(legacy_progress_log_path):
+        return
+    
+    legacy = []
+    with open(legacy_progress_log_path, 'r') as log_file:
         for line in log_file:
             parts = line.strip().split(':')
-            if len(parts) == 3:
-                filename, stage, line_number = parts
-                progress[filename][int(stage)] = int(line_number)
-else:
-    # Create the log file
-    with open(progress_log_path, 'w') as log_file:
-        pass
-
-# Helper function to update progress log
-def update_progress(filename, stage, line_number):
-    """Update the progress log for a specific file and stage."""
-    progress[filename][stage] = line_number
-    
-    # Write the full progress log
-    with open(progress_log_path, 'w') as log_file:
-        for fname, stages in progress.items():
-            for stage_num, line_num in stages.items():
-                log_file.write(f"{fname}:{stage_num}:{line_num}\n")
+            if len(parts) == 3 and int(parts[2]) > 0:
+                legacy.append((parts[0], int(parts[1]), int(parts[2])))
+    
+    for filename, stage, line_number in legacy:
+        if not os.path.exists(os.path.join(data_directory, filename)):
+            continue
+        offset = 0
+        lines_read = 0
+        with open_data_file(filename) as (file, _):
+            while lines_read < line_number:
+                line = file.readline()
+                if not line:
+                    break
+                offset += len(line)
+                lines_read += 1
+            done = file.read(1) == b''
+        record_checkpoint(filename, stage, offset, lines_read, done)
+    
+    os.replace(legacy_progress_log_path, legacy_progress_log_path + '.migrated')
+    log_summary(f"Migrated {len(legacy)} entries from loading_progress.log to the checkpoint journal")
+
+# Ingest manifest for incremental runs: one entry per ingested data file with
+# its size, mtime and a content hash of its first and last HASH_SAMPLE_BYTES.
+# Files whose size and mtime match are skipped without being opened; a file
+# that was only touched (same hash) is skipped after hashing it once.
+def file_content_hash(json_file):
+    """Fast content hash of a data file: blake2b over its size, head and tail."""
+    path = os.path.join(data_directory, json_file)
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, 'rb') as file:
+        digest.update(file.read(HASH_SAMPLE_BYTES))
+        if size > HASH_SAMPLE_BYTES:
+            file.seek(max(size - HASH_SAMPLE_BYTES, HASH_SAMPLE_BYTES))
+            digest.update(file.read())
+    return digest.hexdigest()
+
+def load_manifest():
+    """Load the ingest manifest, or an empty one if there is none yet."""
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r', encoding='utf8') as manifest_file:
+        return json.load(manifest_file)
+
+def save_manifest(manifest):
+    """Write the ingest manifest atomically."""
+    temp_path = manifest_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+        manifest_file.flush()
+        os.fsync(manifest_file.fileno())
+    os.replace(temp_path, manifest_path)
+
+def manifest_entry(json_file):
+    """Build the manifest entry describing the current content of a data file."""
+    size, mtime_ns = file_fingerprint(json_file)
+    return {
+        'size': size,
+        'mtime_ns': mtime_ns,
+        'hash': file_content_hash(json_file),
+        'ingested_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+def find_new_files(json_files, manifest, settle_seconds=0):
+    """
+    Compare data files with the manifest.
+    
+    Args:
+        settle_seconds: Leave files modified within this many seconds for a later run
+    
+    Returns:
+        list: files that are new or whose content changed
+    """
+    new_files = []
+    now_ns = time.time_ns()
+    for json_file in sorted(json_files):
+        size, mtime_ns = file_fingerprint(json_file)
+        if now_ns - mtime_ns < settle_seconds * 1_000_000_000:
+            continue
+        entry = manifest.get(json_file)
+        if entry and entry['size'] == size and entry['mtime_ns'] == mtime_ns:
+            continue
+        if entry and entry['size'] == size and entry['hash'] == file_content_hash(json_file):
+            # Touched but unchanged: remember the new mtime so it is not hashed again
+            entry['mtime_ns'] = mtime_ns
+            continue
+        new_files.append(json_file)
+    return new_files
 
 # Helper function to append to summary log
 def log_summary(message):
@@ -63,18 +567,62 @@ def log_summary(message):
     with open(summary_log_path, 'a') as log_file:
         log_file.write(f"[{timestamp}] {message}\n")
 
+# JSON decoder backends, in order of preference for 'auto'
+JSON_DECODERS = {}
+if orjson is not None:
+    JSON_DECODERS['orjson'] = orjson.loads
+if simdjson is not None:
+    JSON_DECODERS['simdjson'] = simdjson.loads
+JSON_DECODERS['json'] = json.loads
+
+# All backends raise a ValueError subclass for malformed input
+DECODE_ERRORS = (ValueError,)
+
+decode_json = json.loads
+
+def select_decoder(name):
+    """
+    Select the JSON decoder used for every line, falling back to the standard
+    library when the requested backend is not installed.
+    
+    Returns:
+        str: name of the backend that is actually used
+    """
+    global decode_json
+    if name == 'auto':
+        name = next(iter(JSON_DECODERS))
+    elif name not in JSON_DECODERS:
+        print(f"! JSON decoder '{name}' is not installed, falling back to json")
+        name = 'json'
+    decode_json = JSON_DECODERS[name]
+    return name
+
 # Helper functions
+MONTHS = {'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+          'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12}
+
+@lru_cache(maxsize=65536)
+def parse_twitter_timestamp(ts):
+    """
+    Decode a Twitter timestamp such as 'Wed Oct 10 20:19:24 +0000 2018'.
+    
+    The format has fixed positions, so the fields are sliced out directly instead
+    of going through strptime. Many tweets share the same second, hence the cache.
+    """
+    if len(ts) != 30 or ts[19:26] != ' +0000 ':
+        raise ValueError(f"unexpected Twitter timestamp '{ts}'")
+    return datetime(int(ts[26:30]), MONTHS[ts[4:7]], int(ts[8:10]),
+                    int(ts[11:13]), int(ts[14:16]), int(ts[17:19]))
+
 def convert_timestamp(ts):
-    """Convert timestamp to standard format."""
+    """Convert timestamp to a naive UTC datetime with second precision."""
     try:
         # Check if it's a Unix timestamp (in milliseconds)
         if isinstance(ts, int):
-            dt = datetime.fromtimestamp(ts / 1000.0, tz=timezone.utc)
-            return dt.strftime('%Y-%m-%d %H:%M:%S')
+            return datetime.fromtimestamp(ts // 1000, tz=timezone.utc).replace(tzinfo=None)
         # Check if it's a Twitter datetime string
         elif isinstance(ts, str):
-            dt = datetime.strptime(ts, "%a %b %d %H:%M:%S +0000 %Y")
-            return dt.strftime('%Y-%m-%d %H:%M:%S')
+            return parse_twitter_timestamp(ts)
         return None
     except Exception as e:
         print(f"Error parsing timestamp: {e}")
@@ -175,35 +723,495 @@ def clean_tweet_object(data):
         'sentiment': 0  # Default sentiment value
     }
 
+def entity_span(entity):
+    """Return the (start, end) character offsets of an entity, or None for missing ones."""
+    indices = entity.get('indices') or []
+    start = safe_int(indices[0]) if len(indices) > 0 else None
+    end = safe_int(indices[1]) if len(indices) > 1 else None
+    return start, end
+
+# Entity extractors. Each takes the decoded tweet and its id and returns the
+# rows of one entity type; every row starts with the tweet id.
+def extract_hashtags(data, tweet_id):
+    """Hashtags as (tweet_id, text, start_idx, end_idx)."""
+    return [(tweet_id, hashtag.get('text'), *entity_span(hashtag))
+            for hashtag in (data.get('entities') or {}).get('hashtags', [])
+            if hashtag.get('text')]
+
+def extract_mentions(data, tweet_id):
+    """User mentions as (tweet_id, screen_name, start_idx, end_idx, mentioned_user_id)."""
+    return [(tweet_id, mention.get('screen_name'), *entity_span(mention),
+             safe_int(mention.get('id_str') or mention.get('id')))
+            for mention in (data.get('entities') or {}).get('user_mentions', [])
+            if mention.get('screen_name')]
+
+def extract_polls(data, tweet_id):
+    """Polls as (tweet_id, end_datetime, duration_minutes)."""
+    return [(tweet_id, convert_timestamp(poll.get('end_datetime')), safe_int(poll.get('duration_minutes')))
+            for poll in (data.get('entities') or {}).get('polls', [])]
+
+def extract_poll_options(data, tweet_id):
+    """Poll options as (tweet_id, position, text)."""
+    return [(tweet_id, safe_int(option.get('position')), option.get('text'))
+            for poll in (data.get('entities') or {}).get('polls', [])
+            for option in poll.get('options', [])
+            if option.get('text')]
+
+def extract_urls(data, tweet_id):
+    """Links as (tweet_id, expanded_url, start_idx, end_idx)."""
+    return [(tweet_id, url.get('expanded_url') or url.get('url'), *entity_span(url))
+            for url in (data.get('entities') or {}).get('urls', [])
+            if url.get('expanded_url') or url.get('url')]
+
+def extract_media(data, tweet_id):
+    """Attached photos and videos as (tweet_id, media_id, type, media_url, start_idx, end_idx)."""
+    # extended_entities lists every attachment, entities only the first one
+    media = (data.get('extended_entities') or data.get('entities') or {}).get('media', [])
+    return [(tweet_id, safe_int(item.get('id_str') or item.get('id')), item.get('type'),
+             item.get('media_url_https') or item.get('media_url'), *entity_span(item))
+            for item in media]
+
 def extract_entities(data, tweet_id):
-    """Extract hashtags and mentions from tweet."""
+    """
+    Run every registered entity extractor on a tweet in the same pass.
+    
+    Returns:
+        dict: rows per entity type, in ENTITY_EXTRACTORS order
+    """
     if not data or not tweet_id:
-        return [], []
-    
-    hashtags = []
-    mentions = []
-    
-    entities = data.get('entities', {})
-    
-    # Extract hashtags
-    for hashtag in entities.get('hashtags', []):
-        if hashtag.get('text'):
-            hashtags.append((
-                hashtag.get('text'),
-                str(hashtag.get('indices', [])),
-                tweet_id
-            ))
-    
-    # Extract mentions
-    for mention in entities.get('user_mentions', []):
-        if mention.get('screen_name'):
-            mentions.append((
-                str(mention.get('indices', [])),
-                tweet_id,
-                mention.get('screen_name')
-            ))
-            
-    return hashtags, mentions
+        return new_entity_buffers()
+    return {name: extractor['extract'](data, tweet_id) for name, extractor in ENTITY_EXTRACTORS.items()}
+
+def new_entity_buffers():
+    """Empty row buffers for every entity type."""
+    return {name: [] for name in ENTITY_EXTRACTORS}
+
+def extend_entities(buffers, entities):
+    """Append the entity rows of one tweet (or batch) to the buffers."""
+    for name, rows in entities.items():
+        buffers[name].extend(rows)
+
+def user_row(clean_user):
+    """Turn a cleaned user object into the tuple expected by load_users_batch."""
+    return (
+        clean_user['id'],
+        clean_user['name'],
+        clean_user['screen_name'],
+        clean_user['description'],
+        clean_user['verified'],
+        clean_user['followers_count'],
+        clean_user['friends_count'],
+        clean_user['listed_count'],
+        clean_user['favorites_count'],
+        clean_user['status_count']
+    )
+
+def tweet_row_hash(row):
+    """Compact digest of a tweet row, stored in tweet.row_hash to recognise unchanged reloads."""
+    return hashlib.blake2b(repr(row).encode('utf8'), digest_size=16).digest()
+
+def tweet_row(clean_tweet):
+    """Turn a cleaned tweet object into the tuple expected by load_tweets_batch."""
+    row = (
+        clean_tweet['id'],
+        clean_tweet['text'],
+        clean_tweet['created_at'],
+        clean_tweet['in_reply_to_status_id'],
+        clean_tweet['in_reply_to_user'],
+        clean_tweet['user_id'],
+        clean_tweet['quoted_status_id'],
+        clean_tweet['retweeted_id'],
+        clean_tweet['quote_count'],
+        clean_tweet['reply_count'],
+        clean_tweet['retweet_count'],
+        clean_tweet['favorite_count'],
+        clean_tweet['possibly_sensitive'],
+        clean_tweet['language'],
+        clean_tweet['sentiment'],
+        *text_features(clean_tweet['text'])
+    )
+    return row + (tweet_row_hash(row),)
+
+def parse_line(line):
+    """
+    Decode a single JSON line once and build every row it contributes.
+
+    Returns:
+        tuple: (user_row or None, tweet_row or None, entity rows per type)
+
+    Raises one of DECODE_ERRORS for invalid lines.
+    """
+    data = decode_json(line)
+
+    clean_user = clean_user_object(data.get('user'))
+    clean_tweet = clean_tweet_object(data)
+
+    user = user_row(clean_user) if clean_user else None
+    if not clean_tweet:
+        return user, None, new_entity_buffers()
+
+    return user, tweet_row(clean_tweet), extract_entities(data, clean_tweet['id'])
+
+# Airline relevance prefilter. Conversation mining only looks at airline tweets,
+# replies to airlines and the tweets above them, so the optional airline mode
+# loads only those and appends every other line to a compressed cold archive.
+# The airline accounts are the KNOWN_AIRLINES shared with creating_conversations.py.
+AIRLINE_IDS = frozenset(KNOWN_AIRLINES.values())
+
+# fetch_conversation_components reaches the tweet an airline replied to and the
+# tweet before that, so two levels of parents are kept above relevant tweets
+ANCESTOR_DEPTH = 2
+
+# Ids of the tweets to load in airline mode, or None to load everything
+relevant_tweet_ids = None
+relevant_ids_cache_path = os.path.join(log_directory, 'airline_tweet_ids.bin')
+# Fingerprints of the data files relevant_tweet_ids was computed from
+relevant_file_fingerprints = {}
+
+def is_airline_relevant(data):
+    """Check whether a tweet is written by, replies to or mentions an airline."""
+    user = data.get('user') or {}
+    if safe_int(user.get('id_str')) in AIRLINE_IDS:
+        return True
+    if safe_int(data.get('in_reply_to_user_id_str')) in AIRLINE_IDS:
+        return True
+    for mention in (data.get('entities') or {}).get('user_mentions', []):
+        if safe_int(mention.get('id_str')) in AIRLINE_IDS:
+            return True
+    return False
+
+def scan_airline_relevance(json_files):
+    """
+    First pass of airline mode: find the relevant tweets and add the parents
+    they reply to, up to ANCESTOR_DEPTH levels.
+    
+    Returns:
+        set: ids of the tweets to load
+    """
+    seeds = set()
+    reply_parent = {}
+    
+    for json_file in json_files:
+        with open_data_file(json_file) as (file, raw):
+            pbar = tqdm(total=file_fingerprint(json_file)[0], desc=f"[SCAN] {json_file}",
+                        unit="B", unit_scale=True, position=0)
+            for line_number, line in enumerate(file, start=1):
+                if line_number % BATCH_SIZE == 0:
+                    pbar.update(raw.tell() - pbar.n)
+                try:
+                    data = decode_json(line)
+                except DECODE_ERRORS:
+                    continue
+                tweet_id = safe_int(data.get('id_str'))
+                if not tweet_id:
+                    continue
+                parent_id = safe_int(data.get('in_reply_to_status_id_str'))
+                if parent_id:
+                    reply_parent[tweet_id] = parent_id
+                if is_airline_relevant(data):
+                    seeds.add(tweet_id)
+            pbar.update(raw.tell() - pbar.n)
+            pbar.close()
+    
+    keep = set(seeds)
+    frontier = seeds
+    for _ in range(ANCESTOR_DEPTH):
+        frontier = {reply_parent[tweet_id] for tweet_id in frontier if tweet_id in reply_parent} - keep
+        keep |= frontier
+    
+    log_summary(f"Airline scan: {len(seeds)} relevant tweets, {len(keep) - len(seeds)} parent tweets added")
+    return keep
+
+def load_relevant_tweet_ids(json_files):
+    """
+    Get the airline-relevant tweet ids, reusing the result of an earlier scan
+    as long as none of the files it covered changed. Files added since then are
+    scanned on their own (see extend_relevant_tweet_ids).
+    """
+    global relevant_tweet_ids, relevant_file_fingerprints
+    fingerprints = {f: file_fingerprint(f) for f in json_files}
+    fingerprint_path = relevant_ids_cache_path + '.files'
+    
+    if os.path.exists(relevant_ids_cache_path) and os.path.exists(fingerprint_path):
+        with open(fingerprint_path, 'r', encoding='utf8') as fingerprint_file:
+            cached = {f: tuple(fingerprint) for f, *fingerprint in json.loads(fingerprint_file.read())}
+        if all(fingerprints.get(f) == fingerprint for f, fingerprint in cached.items()):
+            ids = array.array('q')
+            with open(relevant_ids_cache_path, 'rb') as ids_file:
+                ids.frombytes(ids_file.read())
+            print(f"Using {len(ids)} airline-relevant tweet ids from the previous scan")
+            relevant_tweet_ids = set(ids)
+            relevant_file_fingerprints = cached
+            extend_relevant_tweet_ids(json_files, [f for f in json_files if f not in cached])
+            return relevant_tweet_ids
+    
+    print("\n--- Scanning for airline-relevant tweets ---")
+    keep = scan_airline_relevance(json_files)
+    save_relevant_tweet_ids(keep, fingerprints)
+    return keep
+
+def fingerprints_key(fingerprints):
+    """Serialized file fingerprints, stored next to the cached ids."""
+    return json.dumps(sorted((f, *fingerprint) for f, fingerprint in fingerprints.items()))
+
+def save_relevant_tweet_ids(ids, fingerprints):
+    """Cache the airline-relevant tweet ids together with the fingerprints of the files they cover."""
+    global relevant_file_fingerprints
+    with open(relevant_ids_cache_path, 'wb') as ids_file:
+        array.array('q', ids).tofile(ids_file)
+    with open(relevant_ids_cache_path + '.files', 'w', encoding='utf8') as fingerprint_file:
+        fingerprint_file.write(fingerprints_key(fingerprints))
+    relevant_file_fingerprints = fingerprints
+
+def extend_relevant_tweet_ids(json_files, new_files):
+    """
+    Add the airline-relevant tweets of new or changed data files to the ids in
+    memory. Only those files are scanned, so the cost of an incremental run
+    does not grow with the corpus. Parents are only followed within the
+    scanned files; tweets in files that are already loaded stay archived even
+    when a new reply makes them relevant.
+    """
+    fingerprints = {f: file_fingerprint(f) for f in json_files}
+    changed = [f for f in new_files if relevant_file_fingerprints.get(f) != fingerprints[f]]
+    if changed:
+        print(f"\n--- Scanning {len(changed)} new files for airline-relevant tweets ---")
+        relevant_tweet_ids.update(scan_airline_relevance(changed))
+    if fingerprints != relevant_file_fingerprints:
+        save_relevant_tweet_ids(relevant_tweet_ids, fingerprints)
+
+def single_pass_stage():
+    """Checkpoint stage used by the single pass in the current mode."""
+    return 0 if relevant_tweet_ids is None else AIRLINE_STAGE
+
+def keep_line(tweet):
+    """Whether the rows of a parsed line are loaded; in airline mode only relevant tweets are."""
+    return relevant_tweet_ids is None or (tweet is not None and tweet[0] in relevant_tweet_ids)
+
+@contextmanager
+def open_cold_archive(json_file):
+    """
+    Open the cold archive for a data file in airline mode, or yield None otherwise.
+    Lines are appended as extra gzip members, so a resumed file may repeat lines
+    that were archived after the last checkpoint.
+    """
+    if relevant_tweet_ids is None:
+        yield None
+        return
+    os.makedirs(cold_archive_directory, exist_ok=True)
+    # Chunks of one file are parsed concurrently, so each gets its own archive
+    json_file, byte_range = split_chunk_key(json_file)
+    archive_name = data_file_base_name(json_file)
+    if byte_range:
+        archive_name += f"@{byte_range[0]}-{byte_range[1]}"
+    archive_name += '.cold.json.gz'
+    with gzip.open(os.path.join(cold_archive_directory, archive_name), 'ab') as archive:
+        yield archive
+
+# Parquet tweet store. Converting the JSON once lets later loads and offline
+# analyses read only the columns and days they need instead of re-parsing JSON.
+PARQUET_BATCH_SIZE = 100_000  # Rows per record batch handed to the Parquet writer
+
+# Columns the loader reads back from the store
+PARQUET_COLUMNS = [
+    'id', 'text', 'created_at', 'in_reply_to_status_id', 'in_reply_to_user', 'user_id',
+    'quoted_status_id', 'retweeted_id', 'quote_count', 'reply_count', 'retweet_count',
+    'favorite_count', 'possibly_sensitive', 'language', 'sentiment',
+    'user', 'hashtags', 'mentions', 'polls', 'poll_options', 'urls', 'media'
+]
+
+def parquet_record(data):
+    """
+    Build the store row for a decoded tweet: the cleaned tweet fields, the cleaned
+    user and the extracted entities. Lines with only a valid user get a row
+    without tweet fields, which lands in the null date partition.
+    
+    Returns:
+        dict or None when the line has neither a valid tweet nor user
+    """
+    clean_user = clean_user_object(data.get('user'))
+    clean_tweet = clean_tweet_object(data)
+    if not clean_user and not clean_tweet:
+        return None
+    
+    record = dict(clean_tweet) if clean_tweet else {}
+    record['user'] = clean_user
+    if clean_tweet:
+        for name, rows in extract_entities(data, clean_tweet['id']).items():
+            column, fields = ENTITY_EXTRACTORS[name]['store']
+            record[column] = [dict(zip(fields, row[1:])) for row in rows]
+        record['date'] = clean_tweet['created_at'].date()
+    return record
+
+def parquet_rows(record):
+    """
+    Turn a row read from the store back into the rows parse_line builds.
+    
+    Returns:
+        tuple: (user_row or None, tweet_row or None, entity rows per type)
+    """
+    user = user_row(record['user']) if record['user'] else None
+    tweet_id = record['id']
+    if tweet_id is None:
+        return user, None, new_entity_buffers()
+    
+    entities = {}
+    for name, extractor in ENTITY_EXTRACTORS.items():
+        column, fields = extractor['store']
+        entities[name] = [(tweet_id, *(item[field] for field in fields)) for item in record[column] or []]
+    return user, tweet_row(record), entities
+
+def parquet_parts(prefix):
+    """Paths of the store files written earlier for one data file."""
+    if not os.path.isdir(store_directory):
+        return []
+    parts = []
+    for partition in os.listdir(store_directory):
+        partition_directory = os.path.join(store_directory, partition)
+        if not os.path.isdir(partition_directory):
+            continue
+        parts.extend(os.path.join(partition_directory, filename)
+                     for filename in os.listdir(partition_directory) if filename.startswith(prefix))
+    return parts
+
+def remove_parquet_parts(prefix):
+    """Delete the store files written earlier for one data file."""
+    for part in parquet_parts(prefix):
+        os.remove(part)
+
+def is_parquet_current(json_file):
+    """Check whether every store file of a data file has the current store layout."""
+    parts = parquet_parts(data_file_base_name(json_file) + '.part-')
+    return all(store_file_version(part) == STORE_VERSION for part in parts)
+
+def convert_file_to_parquet(json_file):
+    """
+    Convert one data file into the Parquet store, partitioned by day. A file is
+    always converted as a whole; its earlier parts are replaced.
+    
+    Returns:
+        tuple: (valid_count, invalid_count)
+    """
+    schema = tweet_store_schema()
+    prefix = data_file_base_name(json_file) + '.part-'
+    remove_parquet_parts(prefix)
+    counts = Counter()
+    
+    def record_batches():
+        records = []
+        with open_data_file(json_file) as (file, raw):
+            pbar = tqdm(total=file_fingerprint(json_file)[0], desc=f"[PARQUET] {json_file}",
+                        unit="B", unit_scale=True, position=0)
+            for line_number, line in enumerate(file, start=1):
+                counts['offset'] += len(line)
+                counts['lines'] = line_number
+                try:
+                    data = decode_json(line)
+                except DECODE_ERRORS:
+                    counts['invalid'] += 1
+                    continue
+                
+                counts['valid'] += 1
+                record = parquet_record(data)
+                if record:
+                    records.append(record)
+                if len(records) >= PARQUET_BATCH_SIZE:
+                    pbar.update(raw.tell() - pbar.n)
+                    yield pa.RecordBatch.from_pylist(records, schema=schema)
+                    records = []
+            pbar.update(raw.tell() - pbar.n)
+            pbar.close()
+        if records:
+            yield pa.RecordBatch.from_pylist(records, schema=schema)
+    
+    ds.write_dataset(record_batches(), store_directory, schema=schema, format='parquet',
+                     partitioning=store_partitioning(), basename_template=prefix + '{i}.parquet',
+                     existing_data_behavior='overwrite_or_ignore')
+    
+    record_checkpoint(json_file, PARQUET_STAGE, counts['offset'], counts['lines'], done=True)
+    log_summary(f"Converted {json_file} to Parquet: {counts['valid']} valid, {counts['invalid']} invalid lines")
+    return counts['valid'], counts['invalid']
+
+def convert_all_to_parquet(json_files):
+    """Convert every data file that changed since its last conversion or was converted with an older store layout."""
+    print(f"\n--- Converting JSON files to Parquet in {store_directory} ---")
+    total_valid = 0
+    total_invalid = 0
+    for json_file in json_files:
+        if is_stage_complete(json_file, PARQUET_STAGE):
+            if is_parquet_current(json_file):
+                print(f"Skipping {json_file} - already converted")
+                continue
+            print(f"Converting {json_file} again - written with an older store layout")
+            log_summary(f"Converting {json_file} again: store files are not version {STORE_VERSION}")
+        valid, invalid = convert_file_to_parquet(json_file)
+        total_valid += valid
+        total_invalid += invalid
+    print(f"Completed conversion: {total_valid} valid, {total_invalid} invalid lines")
+    return total_valid, total_invalid
+
+def process_parquet_fragment(fragment):
+    """
+    Load one Parquet file of the store in a single pass. Progress is tracked in
+    the checkpoint journal like a data file, with the row count as offset.
+    
+    Returns:
+        int: number of rows read
+    """
+    stage = single_pass_stage()
+    key = os.path.relpath(fragment.path, data_directory)
+    rows_done, _, done = get_checkpoint(key, stage)
+    if done:
+        return 0
+    
+    rows = 0
+    for batch in fragment.to_batches(columns=PARQUET_COLUMNS, batch_size=BATCH_SIZE):
+        start = max(rows_done - rows, 0)
+        rows += batch.num_rows
+        if start >= batch.num_rows:
+            continue
+        
+        users_batch = {}
+        tweets_batch = []
+        all_entities = new_entity_buffers()
+        for record in batch.slice(start).to_pylist():
+            user, tweet, entities = parquet_rows(record)
+            if not keep_line(tweet):
+                continue
+            if user:
+                add_user_snapshot(users_batch, user)
+            if tweet:
+                tweets_batch.append(tweet)
+                extend_entities(all_entities, entities)
+        
+        flush_batches(cursor, list(users_batch.values()), tweets_batch, all_entities)
+        commit_batches(connection)
+        record_checkpoint(key, stage, rows, rows)
+    
+    record_checkpoint(key, stage, rows, rows, done=True)
+    return rows - rows_done
+
+def load_from_parquet(start_date=None, end_date=None):
+    """
+    Load the Parquet store instead of the JSON files. Only the day partitions in
+    the given range are opened and only the loaded columns are read.
+    
+    Returns:
+        tuple: (valid_count, invalid_count); the store holds no invalid lines
+    """
+    print("\n--- Loading users, tweets and entities from the Parquet store ---")
+    log_summary(f"Starting load from Parquet store ({start_date or 'start'} to {end_date or 'end'})")
+    
+    fragments = list(open_tweet_store().get_fragments(filter=date_filter(start_date, end_date)))
+    outdated = [fragment.path for fragment in fragments if store_file_version(fragment.path) != STORE_VERSION]
+    if outdated:
+        raise RuntimeError(f"{len(outdated)} Parquet files were written with an older store layout, "
+                           f"run with --to-parquet first to convert them again")
+    total_rows = 0
+    for fragment in tqdm(fragments, desc="[PARQUET] fragments", unit="file"):
+        total_rows += process_parquet_fragment(fragment)
+    
+    log_summary(f"Loaded {total_rows} rows from {len(fragments)} Parquet files")
+    return total_rows, 0
 
 # Database functions
 def setup_database_tables():
@@ -245,19 +1253,70 @@ def setup_database_tables():
             possibly_sensitive BIT DEFAULT 0,
             language NVARCHAR(10),
             sentiment FLOAT DEFAULT 0,
+            norm_text NVARCHAR(MAX),
+            issue_mask INT,
+            dm_mention BIT,
+            row_hash BINARY(16),
             FOREIGN KEY (user_id) REFERENCES [user](id),
         )
         """)
         
+        # Add the precomputed text features to tweet tables created before they existed.
+        # Existing rows keep NULL until they are loaded again; analyses fall back to the text
+        cursor.execute("""
+        IF COL_LENGTH('dbo.tweet', 'issue_mask') IS NULL
+            ALTER TABLE dbo.tweet ADD issue_mask INT NULL, dm_mention BIT NULL;
+        IF COL_LENGTH('dbo.tweet', 'text') IS NOT NULL AND COL_LENGTH('dbo.tweet', 'norm_text') IS NULL
+            ALTER TABLE dbo.tweet ADD norm_text NVARCHAR(MAX) NULL;
+        IF COL_LENGTH('dbo.tweet', 'row_hash') IS NULL
+            ALTER TABLE dbo.tweet ADD row_hash BINARY(16) NULL;
+        IF OBJECT_ID('dbo.tweet_text') IS NOT NULL AND COL_LENGTH('dbo.tweet_text', 'norm_text') IS NULL
+            ALTER TABLE dbo.tweet_text ADD norm_text NVARCHAR(MAX) NULL;
+        """)
+        
+        # Create the dictionaries of distinct hashtag texts and mentioned screen names,
+        # keyed by their lowercase form as computed by normalize_entity, with a binary collation
+        # so lookups compare the keys exactly
+        cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'hashtag_text')
+        CREATE TABLE hashtag_text (
+            id INT IDENTITY(1,1) PRIMARY KEY,
+            normalized NVARCHAR(280) COLLATE Latin1_General_100_BIN2 NOT NULL UNIQUE,
+            text NVARCHAR(280) NOT NULL
+        )
+        """)
+        
+        cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'mention_name')
+        CREATE TABLE mention_name (
+            id INT IDENTITY(1,1) PRIMARY KEY,
+            normalized NVARCHAR(100) COLLATE Latin1_General_100_BIN2 NOT NULL UNIQUE,
+            name NVARCHAR(100) NOT NULL
+        )
+        """)
+        
+        # Move entity tables with the old text/indices layout aside, so they can be migrated.
+        # The old poll table (filled by loadingData.py) used the poll id from the JSON as key
+        cursor.execute("""
+        IF COL_LENGTH('dbo.hashtag', 'indices') IS NOT NULL
+            EXEC sp_rename 'dbo.hashtag', 'hashtag_legacy';
+        IF COL_LENGTH('dbo.mention', 'indices') IS NOT NULL
+            EXEC sp_rename 'dbo.mention', 'mention_legacy';
+        IF OBJECT_ID('dbo.poll') IS NOT NULL AND COLUMNPROPERTY(OBJECT_ID('dbo.poll'), 'id', 'IsIdentity') = 0
+            EXEC sp_rename 'dbo.poll', 'poll_legacy';
+        """)
+        
         # Create hashtag table
         cursor.execute("""
         IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'hashtag')
         CREATE TABLE hashtag (
             id INT IDENTITY(1,1) PRIMARY KEY,
-            text NVARCHAR(280) NOT NULL,
-            indices NVARCHAR(50),
             tweet_id BIGINT NOT NULL,
-            FOREIGN KEY (tweet_id) REFERENCES tweet(id)
+            text_id INT NOT NULL,
+            start_idx SMALLINT,
+            end_idx SMALLINT,
+            FOREIGN KEY (tweet_id) REFERENCES tweet(id),
+            FOREIGN KEY (text_id) REFERENCES hashtag_text(id)
         )
         """)
         
@@ -266,43 +1325,447 @@ def setup_database_tables():
         IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'mention')
         CREATE TABLE mention (
             id INT IDENTITY(1,1) PRIMARY KEY,
-            indices NVARCHAR(50),
             tweet_id BIGINT NOT NULL,
-            name NVARCHAR(100),
-            FOREIGN KEY (tweet_id) REFERENCES tweet(id)
+            name_id INT NOT NULL,
+            start_idx SMALLINT,
+            end_idx SMALLINT,
+            mentioned_user_id BIGINT,
+            FOREIGN KEY (tweet_id) REFERENCES tweet(id),
+            FOREIGN KEY (name_id) REFERENCES mention_name(id)
         )
         """)
         
-        connection.commit()
-        print("✓ Database tables created successfully")
-        log_summary("Database tables created successfully")
-        return True
-    except Exception as e:
-        print(f"! Error creating database tables: {e}")
-        log_summary(f"Error creating database tables: {e}")
-        return False
-    
-    # Replace your current index creation code with this:
-def create_indexes():
-    """Create indexes if they don't exist using SQL Server compatible syntax."""
-    try:
-        # Check and create user_id index
+        # Mentioned users are often not loaded themselves, so mentioned_user_id has no foreign key.
+        # Mentions loaded before the column existed get the id of the loaded user with that screen name
         cursor.execute("""
-        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'idx_tweet_user_id' AND object_id = OBJECT_ID('dbo.tweet'))
+        IF COL_LENGTH('dbo.mention', 'mentioned_user_id') IS NULL
         BEGIN
-            CREATE INDEX idx_tweet_user_id ON tweet(user_id)
+            ALTER TABLE dbo.mention ADD mentioned_user_id BIGINT NULL;
+            EXEC('UPDATE m SET mentioned_user_id = (SELECT TOP 1 u.id FROM dbo.[user] u WHERE u.screen_name = n.name ORDER BY u.id)
+                  FROM dbo.mention m JOIN dbo.mention_name n ON n.id = m.name_id');
         END
         """)
         
-        # Check and create reply index
+        # Create poll tables
         cursor.execute("""
-        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'idx_tweet_reply' AND object_id = OBJECT_ID('dbo.tweet'))
-        BEGIN
-            CREATE INDEX idx_tweet_reply ON tweet(in_reply_to_status_id)
-        END
-        """)
-        
-        # Check and create created_at index
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'poll')
+        CREATE TABLE poll (
+            id INT IDENTITY(1,1) PRIMARY KEY,
+            tweet_id BIGINT NOT NULL,
+            end_datetime DATETIME,
+            duration_minutes INT,
+            FOREIGN KEY (tweet_id) REFERENCES tweet(id)
+        )
+        """)
+        
+        cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'poll_option')
+        CREATE TABLE poll_option (
+            id INT IDENTITY(1,1) PRIMARY KEY,
+            tweet_id BIGINT NOT NULL,
+            position TINYINT,
+            text NVARCHAR(100),
+            FOREIGN KEY (tweet_id) REFERENCES tweet(id)
+        )
+        """)
+        
+        # Create url table
+        cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'url')
+        CREATE TABLE url (
+            id INT IDENTITY(1,1) PRIMARY KEY,
+            tweet_id BIGINT NOT NULL,
+            expanded_url NVARCHAR(2048),
+            start_idx SMALLINT,
+            end_idx SMALLINT,
+            FOREIGN KEY (tweet_id) REFERENCES tweet(id)
+        )
+        """)
+        
+        # Create media table
+        cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'media')
+        CREATE TABLE media (
+            id INT IDENTITY(1,1) PRIMARY KEY,
+            tweet_id BIGINT NOT NULL,
+            media_id BIGINT,
+            type NVARCHAR(20),
+            media_url NVARCHAR(1024),
+            start_idx SMALLINT,
+            end_idx SMALLINT,
+            FOREIGN KEY (tweet_id) REFERENCES tweet(id)
+        )
+        """)
+        
+        migrate_legacy_entities()
+        
+        connection.commit()
+        print("✓ Database tables created successfully")
+        log_summary("Database tables created successfully")
+        return True
+    except Exception as e:
+        print(f"! Error creating database tables: {e}")
+        log_summary(f"Error creating database tables: {e}")
+        return False
+    
+# Tweet text layouts. 'inline' keeps text in dbo.tweet. 'split' and 'compressed'
+# move it to dbo.tweet_text keyed by tweet id (as NVARCHAR or as COMPRESS()ed
+# VARBINARY), so graph and time scans over dbo.tweet read narrow rows. The
+# normalized text moves along with it; issue_mask, dm_mention and row_hash are
+# compact and stay in dbo.tweet. The tweet_full view exposes the full tweet in every
+# layout for readers that need the text.
+TWEET_COLUMNS = ['id', 'text', 'created_at', 'in_reply_to_status_id', 'in_reply_to_user',
+                 'user_id', 'quoted_status_id', 'retweeted_id', 'quote_count', 'reply_count',
+                 'retweet_count', 'favorite_count', 'possibly_sensitive', 'language', 'sentiment',
+                 'norm_text', 'issue_mask', 'dm_mention', 'row_hash']
+TEXT_COLUMNS = ['text', 'norm_text']
+CORE_POSITIONS = [i for i, column in enumerate(TWEET_COLUMNS) if column not in TEXT_COLUMNS]
+TEXT_POSITIONS = [0] + [TWEET_COLUMNS.index(column) for column in TEXT_COLUMNS]
+tweet_text_layout = None
+
+def get_tweet_text_layout(cursor):
+    """Read the tweet text layout from the database once per process."""
+    global tweet_text_layout
+    if tweet_text_layout is None:
+        cursor.execute("""
+        SELECT CASE WHEN COL_LENGTH('dbo.tweet', 'text') IS NOT NULL THEN 'inline'
+                    WHEN COL_LENGTH('dbo.tweet_text', 'text_compressed') IS NOT NULL THEN 'compressed'
+                    ELSE 'split' END
+        """)
+        tweet_text_layout = cursor.fetchone()[0]
+    return tweet_text_layout
+
+def split_tweet_text(layout):
+    """Move tweet text out of dbo.tweet into dbo.tweet_text, optionally compressed."""
+    compressed = layout == 'compressed'
+    column = "text_compressed VARBINARY(MAX) NOT NULL" if compressed else "text NVARCHAR(MAX) NOT NULL"
+    cursor.execute(f"""
+    CREATE TABLE tweet_text (
+        id BIGINT PRIMARY KEY,
+        {column},
+        norm_text NVARCHAR(MAX),
+        FOREIGN KEY (id) REFERENCES tweet(id)
+    )
+    """)
+    cursor.execute(f"""
+    INSERT INTO dbo.tweet_text (id, {'text_compressed' if compressed else 'text'}, norm_text)
+    SELECT id, {'COMPRESS(text)' if compressed else 'text'}, norm_text
+    FROM dbo.tweet
+    WHERE text IS NOT NULL
+    """)
+    cursor.execute("ALTER TABLE dbo.tweet DROP COLUMN text, norm_text")
+    # Dropping a column only changes metadata; the rebuild actually narrows the rows
+    cursor.execute("ALTER TABLE dbo.tweet REBUILD")
+
+def setup_tweet_text(layout=None):
+    """
+    Apply a requested tweet text layout and (re)create the tweet_full view.
+
+    Args:
+        layout: 'split' or 'compressed' to move text out of dbo.tweet, None to keep the current layout
+    """
+    global tweet_text_layout
+    try:
+        current = get_tweet_text_layout(cursor)
+        if layout and layout != current:
+            if current != 'inline':
+                print(f"! Tweet text is already stored as '{current}'; keeping that layout")
+            else:
+                print(f"Moving tweet text into dbo.tweet_text ({layout})...")
+                split_tweet_text(layout)
+                tweet_text_layout = None
+                current = get_tweet_text_layout(cursor)
+                log_summary(f"Moved tweet text into dbo.tweet_text ({current})")
+        
+        columns = ", ".join(f"t.{column}" for column in TWEET_COLUMNS if column not in TEXT_COLUMNS)
+        if current == 'inline':
+            text = "t.text, t.norm_text"
+            source = "dbo.tweet t"
+        else:
+            text = "CAST(DECOMPRESS(tt.text_compressed) AS NVARCHAR(MAX))" if current == 'compressed' else "tt.text"
+            text += " AS text, tt.norm_text"
+            source = "dbo.tweet t LEFT JOIN dbo.tweet_text tt ON tt.id = t.id"
+        cursor.execute(f"CREATE OR ALTER VIEW dbo.tweet_full AS SELECT {columns}, {text} FROM {source}")
+        connection.commit()
+        print(f"✓ Tweet text layout: {current}")
+        return True
+    except Exception as e:
+        connection.rollback()
+        print(f"! Error setting up the tweet text layout: {e}")
+        log_summary(f"Error setting up the tweet text layout: {e}")
+        return False
+
+# Optional analytical layout. A nonclustered columnstore over the columns the
+# db_repository aggregates use, partitioned by month of created_at, lets
+# date-bounded queries skip whole partitions and segments. The rowstore table
+# itself keeps its clustered primary key on id, which the entity and
+# conversation tables reference.
+PARTITION_FUNCTION = 'pf_tweet_month'
+PARTITION_SCHEME = 'ps_tweet_month'
+COLUMNSTORE_INDEX = 'ncci_tweet_analytics'
+COLUMNSTORE_COLUMNS = ['created_at', 'id', 'user_id', 'in_reply_to_status_id', 'in_reply_to_user',
+                       'quoted_status_id', 'retweeted_id', 'quote_count', 'reply_count', 'retweet_count',
+                       'favorite_count', 'language', 'sentiment', 'issue_mask', 'dm_mention']
+tweet_partitioned = None
+
+def is_tweet_partitioned(cursor):
+    """Check once per process whether dbo.tweet has the partitioned columnstore."""
+    global tweet_partitioned
+    if tweet_partitioned is None:
+        cursor.execute(f"""
+        SELECT COUNT(*) FROM sys.indexes
+        WHERE name = '{COLUMNSTORE_INDEX}' AND object_id = OBJECT_ID('dbo.tweet')
+        """)
+        tweet_partitioned = cursor.fetchone()[0] > 0
+    return tweet_partitioned
+
+def month_boundaries(first, last):
+    """First day of every month from the month of `first` up to the month after `last`."""
+    month = datetime(first.year, first.month, 1)
+    boundaries = []
+    while month <= last:
+        boundaries.append(month)
+        month = datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+    boundaries.append(month)
+    return boundaries
+
+def get_tweet_month_boundaries():
+    """Month boundaries needed to give every loaded tweet its own partition."""
+    cursor.execute("SELECT MIN(created_at), MAX(created_at) FROM dbo.tweet")
+    first, last = cursor.fetchone()
+    if first is None:
+        now = datetime.now()
+        first = last = datetime(now.year, now.month, 1)
+    return month_boundaries(first, last)
+
+def get_partition_boundaries():
+    """Boundaries currently defined in the partition function."""
+    cursor.execute(f"""
+    SELECT CAST(v.value AS DATETIME)
+    FROM sys.partition_range_values v
+    JOIN sys.partition_functions f ON f.function_id = v.function_id
+    WHERE f.name = '{PARTITION_FUNCTION}'
+    """)
+    return {row[0] for row in cursor.fetchall()}
+
+def create_tweet_columnstore():
+    """Create the columnstore on the partition scheme; building it compresses every row group."""
+    cursor.execute(f"""
+    CREATE NONCLUSTERED COLUMNSTORE INDEX {COLUMNSTORE_INDEX}
+    ON dbo.tweet ({", ".join(COLUMNSTORE_COLUMNS)})
+    ON {PARTITION_SCHEME}(created_at)
+    """)
+
+def partition_tweets():
+    """Create the monthly partition function and scheme and the partitioned columnstore."""
+    global tweet_partitioned
+    try:
+        if is_tweet_partitioned(cursor):
+            print("✓ Tweet columnstore already partitioned by month")
+            return True
+        
+        boundaries = get_tweet_month_boundaries()
+        print(f"Partitioning the tweet columnstore into {len(boundaries) + 1} monthly partitions...")
+        cursor.execute(f"""
+        IF NOT EXISTS (SELECT * FROM sys.partition_functions WHERE name = '{PARTITION_FUNCTION}')
+        CREATE PARTITION FUNCTION {PARTITION_FUNCTION} (DATETIME)
+        AS RANGE RIGHT FOR VALUES ({", ".join(f"'{boundary:%Y-%m-%d}'" for boundary in boundaries)})
+        """)
+        cursor.execute(f"""
+        IF NOT EXISTS (SELECT * FROM sys.partition_schemes WHERE name = '{PARTITION_SCHEME}')
+        CREATE PARTITION SCHEME {PARTITION_SCHEME} AS PARTITION {PARTITION_FUNCTION} ALL TO ([PRIMARY])
+        """)
+        create_tweet_columnstore()
+        connection.commit()
+        tweet_partitioned = True
+        print("✓ Tweet columnstore partitioned by month")
+        log_summary(f"Created {COLUMNSTORE_INDEX} with {len(boundaries) + 1} monthly partitions")
+        return True
+    except Exception as e:
+        connection.rollback()
+        print(f"! Error partitioning the tweet table: {e}")
+        log_summary(f"Error partitioning the tweet table: {e}")
+        return False
+
+def maintain_tweet_partitions():
+    """
+    Add partitions for newly loaded months and compact the columnstore.
+
+    Columnstore partitions can only be split while they are empty, so when
+    loaded tweets fall outside the current boundaries the index is dropped,
+    the new months are split off and the index is built again. Otherwise the
+    partitions with open or closed delta row groups, or with deleted rows,
+    are reorganized with COMPRESS_ALL_ROW_GROUPS.
+    """
+    if not is_tweet_partitioned(cursor):
+        print("! The tweet table is not partitioned; run with --partition-tweets first")
+        return False
+    
+    try:
+        missing = sorted(set(get_tweet_month_boundaries()) - get_partition_boundaries())
+        if missing:
+            print(f"Adding {len(missing)} monthly partitions and rebuilding {COLUMNSTORE_INDEX}...")
+            cursor.execute(f"DROP INDEX {COLUMNSTORE_INDEX} ON dbo.tweet")
+            for boundary in missing:
+                cursor.execute(f"ALTER PARTITION SCHEME {PARTITION_SCHEME} NEXT USED [PRIMARY]")
+                cursor.execute(f"ALTER PARTITION FUNCTION {PARTITION_FUNCTION}() SPLIT RANGE ('{boundary:%Y-%m-%d}')")
+            create_tweet_columnstore()
+            connection.commit()
+            log_summary(f"Added {len(missing)} monthly partitions to {COLUMNSTORE_INDEX}")
+        else:
+            cursor.execute(f"""
+            SELECT DISTINCT s.partition_number
+            FROM sys.dm_db_column_store_row_group_physical_stats s
+            JOIN sys.indexes i ON i.object_id = s.object_id AND i.index_id = s.index_id
+            WHERE i.name = '{COLUMNSTORE_INDEX}' AND s.object_id = OBJECT_ID('dbo.tweet')
+              AND (s.state_desc IN ('OPEN', 'CLOSED') OR s.deleted_rows > 0)
+            ORDER BY s.partition_number
+            """)
+            partitions = [row[0] for row in cursor.fetchall()]
+            for partition in tqdm(partitions, desc="Reorganizing partitions", unit="partition"):
+                cursor.execute(f"""
+                ALTER INDEX {COLUMNSTORE_INDEX} ON dbo.tweet
+                REORGANIZE PARTITION = {partition} WITH (COMPRESS_ALL_ROW_GROUPS = ON)
+                """)
+                connection.commit()
+            log_summary(f"Reorganized {len(partitions)} partitions of {COLUMNSTORE_INDEX}")
+        print("✓ Tweet partitions maintained")
+        return True
+    except Exception as e:
+        connection.rollback()
+        print(f"! Error maintaining tweet partitions: {e}")
+        log_summary(f"Error maintaining tweet partitions: {e}")
+        return False
+
+# Old indices strings look like '[6, 18]'; these expressions cut out both numbers
+LEGACY_START_IDX = """TRY_CAST(CASE WHEN CHARINDEX(',', indices) > 1
+        THEN SUBSTRING(indices, 2, CHARINDEX(',', indices) - 2) END AS SMALLINT)"""
+LEGACY_END_IDX = """TRY_CAST(CASE WHEN CHARINDEX(',', indices) > 1
+        THEN REPLACE(SUBSTRING(indices, CHARINDEX(',', indices) + 1, 50), ']', '') END AS SMALLINT)"""
+
+def stage_legacy_keys(kind, legacy_table, legacy_column):
+    """
+    Stage the distinct values of a legacy entity column in #legacy_key with
+    their dictionary key. The keys are computed by normalize_entity, like at
+    ingest: SQL Server's LOWER follows the database collation and lowercases
+    many non-ASCII characters differently than str.lower().
+    """
+    _, _, length = ENTITY_DICTIONARIES[kind]
+    cursor.execute(f"""
+    SELECT DISTINCT {legacy_column} COLLATE Latin1_General_100_BIN2
+    FROM dbo.{legacy_table}
+    WHERE {legacy_column} IS NOT NULL
+    """)
+    keys = [(value, normalize_entity(value)) for value, in cursor.fetchall()]
+    cursor.execute(f"""
+    IF OBJECT_ID('tempdb..#legacy_key') IS NOT NULL DROP TABLE #legacy_key;
+    CREATE TABLE #legacy_key (
+        value NVARCHAR({length}) COLLATE Latin1_General_100_BIN2 NOT NULL PRIMARY KEY,
+        normalized NVARCHAR({length}) COLLATE Latin1_General_100_BIN2 NOT NULL
+    );
+    """)
+    stage_rows(cursor, "INSERT INTO #legacy_key (value, normalized) VALUES (?, ?);",
+               [(pyodbc.SQL_WVARCHAR, length, 0), (pyodbc.SQL_WVARCHAR, length, 0)], keys)
+
+def legacy_table_exists(table):
+    """Whether a table renamed by an older layout migration is still waiting to be copied."""
+    cursor.execute("SELECT OBJECT_ID(?)", (f"dbo.{table}",))
+    return cursor.fetchone()[0] is not None
+
+def migrate_legacy_entities():
+    """
+    Copy hashtags and mentions from the old text/indices layout into the compact
+    tables, and polls and their options from the old poll/options tables.
+    """
+    if legacy_table_exists('hashtag_legacy'):
+        stage_legacy_keys('hashtag', 'hashtag_legacy', 'text')
+        cursor.execute(f"""
+        INSERT INTO dbo.hashtag_text (normalized, text)
+        SELECT k.normalized, MIN(k.value)
+        FROM #legacy_key k
+        WHERE NOT EXISTS (SELECT 1 FROM dbo.hashtag_text d WHERE d.normalized = k.normalized)
+        GROUP BY k.normalized;
+        
+        INSERT INTO dbo.hashtag (tweet_id, text_id, start_idx, end_idx)
+        SELECT l.tweet_id, d.id, {LEGACY_START_IDX}, {LEGACY_END_IDX}
+        FROM dbo.hashtag_legacy l
+        JOIN #legacy_key k ON k.value = l.text COLLATE Latin1_General_100_BIN2
+        JOIN dbo.hashtag_text d ON d.normalized = k.normalized;
+        
+        DROP TABLE dbo.hashtag_legacy;
+        DROP TABLE #legacy_key;
+        """)
+    if legacy_table_exists('mention_legacy'):
+        stage_legacy_keys('mention', 'mention_legacy', 'name')
+        cursor.execute(f"""
+        INSERT INTO dbo.mention_name (normalized, name)
+        SELECT k.normalized, MIN(k.value)
+        FROM #legacy_key k
+        WHERE NOT EXISTS (SELECT 1 FROM dbo.mention_name d WHERE d.normalized = k.normalized)
+        GROUP BY k.normalized;
+        
+        INSERT INTO dbo.mention (tweet_id, name_id, start_idx, end_idx, mentioned_user_id)
+        SELECT l.tweet_id, d.id, {LEGACY_START_IDX}, {LEGACY_END_IDX},
+               (SELECT TOP 1 u.id FROM dbo.[user] u WHERE u.screen_name = l.name ORDER BY u.id)
+        FROM dbo.mention_legacy l
+        JOIN #legacy_key k ON k.value = l.name COLLATE Latin1_General_100_BIN2
+        JOIN dbo.mention_name d ON d.normalized = k.normalized;
+        
+        DROP TABLE dbo.mention_legacy;
+        DROP TABLE #legacy_key;
+        """)
+    # Old options point to their poll by poll id; options of polls without an id
+    # cannot be attributed to a tweet and are dropped with the old tables
+    cursor.execute("""
+    IF OBJECT_ID('dbo.poll_legacy') IS NOT NULL
+    BEGIN
+        INSERT INTO dbo.poll (tweet_id, end_datetime, duration_minutes)
+        SELECT l.tweet_id, TRY_CONVERT(DATETIME, l.end_datetime), l.duration_minutes
+        FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY tweet_id ORDER BY id) AS copy FROM dbo.poll_legacy) l
+        WHERE l.copy = 1
+          AND EXISTS (SELECT 1 FROM dbo.tweet t WHERE t.id = l.tweet_id)
+          AND NOT EXISTS (SELECT 1 FROM dbo.poll p WHERE p.tweet_id = l.tweet_id);
+        
+        IF OBJECT_ID('dbo.options') IS NOT NULL
+        BEGIN
+            INSERT INTO dbo.poll_option (tweet_id, position, text)
+            SELECT o.tweet_id, o.position, o.text
+            FROM (SELECT l.tweet_id, o.position, o.text,
+                         ROW_NUMBER() OVER (PARTITION BY l.tweet_id, o.position ORDER BY l.id) AS copy
+                  FROM dbo.options o
+                  JOIN dbo.poll_legacy l ON l.id = o.poll_id) o
+            WHERE o.copy = 1
+              AND EXISTS (SELECT 1 FROM dbo.tweet t WHERE t.id = o.tweet_id)
+              AND NOT EXISTS (SELECT 1 FROM dbo.poll_option p WHERE p.tweet_id = o.tweet_id AND p.position = o.position);
+            
+            DROP TABLE dbo.options;
+        END
+        
+        DROP TABLE dbo.poll_legacy;
+    END
+    """)
+
+    # Replace your current index creation code with this:
+def create_indexes():
+    """Create indexes if they don't exist using SQL Server compatible syntax."""
+    try:
+        # Check and create user_id index
+        cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'idx_tweet_user_id' AND object_id = OBJECT_ID('dbo.tweet'))
+        BEGIN
+            CREATE INDEX idx_tweet_user_id ON tweet(user_id)
+        END
+        """)
+        
+        # Check and create reply index
+        cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'idx_tweet_reply' AND object_id = OBJECT_ID('dbo.tweet'))
+        BEGIN
+            CREATE INDEX idx_tweet_reply ON tweet(in_reply_to_status_id)
+        END
+        """)
+        
+        # Check and create created_at index
         cursor.execute("""
         IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'idx_tweet_created_at' AND object_id = OBJECT_ID('dbo.tweet'))
         BEGIN
@@ -318,22 +1781,623 @@ def create_indexes():
         END
         """)
         
+        # Check and create the entity dictionary indexes, used to group by hashtag or mentioned name
+        cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'idx_hashtag_text_id' AND object_id = OBJECT_ID('dbo.hashtag'))
+        BEGIN
+            CREATE INDEX idx_hashtag_text_id ON hashtag(text_id)
+        END
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'idx_mention_name_id' AND object_id = OBJECT_ID('dbo.mention'))
+        BEGIN
+            CREATE INDEX idx_mention_name_id ON mention(name_id)
+        END
+        """)
+        
+        # Check and create the mentioned user index, so mention counts per airline are one seek
+        cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'idx_mention_user_tweet' AND object_id = OBJECT_ID('dbo.mention'))
+        BEGIN
+            CREATE INDEX idx_mention_user_tweet ON mention(mentioned_user_id, tweet_id)
+        END
+        """)
+        
         connection.commit()
         print("✓ Database indexes created or already exist")
         log_summary("Database indexes created or already exist")
-        return True
+        return create_entity_keys()
     except Exception as e:
         print(f"! Could not create indexes - performance might be affected: {e}")
         log_summary(f"Could not create indexes - performance might be affected: {e}")
         return False
 
+# Entity tables with their columns as (name, SQL type, parameter size) and the
+# key that identifies an entity: the tweet and its position in the tweet. Loads
+# only insert rows whose key is new, so resumed or repeated loads add nothing.
+# The uq_<table>_key unique indexes enforce the keys; they are not idx_ indexes,
+# so --defer-indexes leaves them enabled for the anti-join lookups.
+ENTITY_TABLES = {
+    'hashtag': {
+        'columns': [('tweet_id', 'BIGINT', (pyodbc.SQL_BIGINT, 0, 0)), ('text_id', 'INT', (pyodbc.SQL_INTEGER, 0, 0)),
+                    ('start_idx', 'SMALLINT', (pyodbc.SQL_SMALLINT, 0, 0)), ('end_idx', 'SMALLINT', (pyodbc.SQL_SMALLINT, 0, 0))],
+        'key': ['tweet_id', 'start_idx', 'text_id']
+    },
+    'mention': {
+        'columns': [('tweet_id', 'BIGINT', (pyodbc.SQL_BIGINT, 0, 0)), ('name_id', 'INT', (pyodbc.SQL_INTEGER, 0, 0)),
+                    ('start_idx', 'SMALLINT', (pyodbc.SQL_SMALLINT, 0, 0)), ('end_idx', 'SMALLINT', (pyodbc.SQL_SMALLINT, 0, 0)),
+                    ('mentioned_user_id', 'BIGINT', (pyodbc.SQL_BIGINT, 0, 0))],
+        'key': ['tweet_id', 'start_idx', 'name_id']
+    },
+    'poll': {
+        'columns': [('tweet_id', 'BIGINT', (pyodbc.SQL_BIGINT, 0, 0)), ('end_datetime', 'DATETIME', (pyodbc.SQL_TYPE_TIMESTAMP, 23, 3)),
+                    ('duration_minutes', 'INT', (pyodbc.SQL_INTEGER, 0, 0))],
+        'key': ['tweet_id']
+    },
+    'poll_option': {
+        'columns': [('tweet_id', 'BIGINT', (pyodbc.SQL_BIGINT, 0, 0)), ('position', 'TINYINT', (pyodbc.SQL_TINYINT, 0, 0)),
+                    ('text', 'NVARCHAR(100)', (pyodbc.SQL_WVARCHAR, 100, 0))],
+        'key': ['tweet_id', 'position']
+    },
+    'url': {
+        'columns': [('tweet_id', 'BIGINT', (pyodbc.SQL_BIGINT, 0, 0)), ('expanded_url', 'NVARCHAR(2048)', (pyodbc.SQL_WVARCHAR, 2048, 0)),
+                    ('start_idx', 'SMALLINT', (pyodbc.SQL_SMALLINT, 0, 0)), ('end_idx', 'SMALLINT', (pyodbc.SQL_SMALLINT, 0, 0))],
+        'key': ['tweet_id', 'start_idx']
+    },
+    'media': {
+        'columns': [('tweet_id', 'BIGINT', (pyodbc.SQL_BIGINT, 0, 0)), ('media_id', 'BIGINT', (pyodbc.SQL_BIGINT, 0, 0)),
+                    ('type', 'NVARCHAR(20)', (pyodbc.SQL_WVARCHAR, 20, 0)), ('media_url', 'NVARCHAR(1024)', (pyodbc.SQL_WVARCHAR, 1024, 0)),
+                    ('start_idx', 'SMALLINT', (pyodbc.SQL_SMALLINT, 0, 0)), ('end_idx', 'SMALLINT', (pyodbc.SQL_SMALLINT, 0, 0))],
+        'key': ['tweet_id', 'media_id']
+    }
+}
+
+def create_entity_keys():
+    """
+    Create the unique key index of every entity table. A table that still holds
+    duplicate entities keeps loading without one until --dedupe-entities has run.
+    """
+    created = True
+    for table, definition in ENTITY_TABLES.items():
+        try:
+            cursor.execute(f"""
+            IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'uq_{table}_key' AND object_id = OBJECT_ID('dbo.{table}'))
+            BEGIN
+                CREATE UNIQUE INDEX uq_{table}_key ON dbo.{table}({", ".join(definition['key'])})
+            END
+            """)
+            connection.commit()
+        except pyodbc.Error as e:
+            connection.rollback()
+            created = False
+            print(f"! Could not create uq_{table}_key, run with --dedupe-entities to remove duplicate {table} rows: {e}")
+            log_summary(f"Could not create uq_{table}_key: {e}")
+    return created
+
+def dedupe_entities():
+    """
+    Delete repeated entity rows, keeping the first loaded copy of every key,
+    and create the unique key indexes that keep them out from then on.
+    """
+    try:
+        for table, definition in ENTITY_TABLES.items():
+            cursor.execute(f"""
+            WITH copies AS (
+                SELECT ROW_NUMBER() OVER (PARTITION BY {", ".join(definition['key'])} ORDER BY id) AS copy
+                FROM dbo.{table}
+            )
+            DELETE FROM copies WHERE copy > 1;
+            """)
+            deleted = cursor.rowcount
+            connection.commit()
+            print(f"✓ Removed {deleted} duplicate {table} rows")
+            log_summary(f"Removed {deleted} duplicate {table} rows")
+    except Exception as e:
+        connection.rollback()
+        print(f"! Error removing duplicate entities: {e}")
+        log_summary(f"Error removing duplicate entities: {e}")
+        return False
+    return create_entity_keys()
+
+# Deferred index maintenance. With --defer-indexes the nonclustered idx_ indexes
+# of the loader tables (and optionally their foreign keys) are disabled while
+# loading and rebuilt in one sorted pass afterwards. A disabled index stays
+# visible in sys.indexes, so the database itself records an interrupted load
+# and the next run rebuilds whatever is still disabled before doing anything else.
+# A --watch run never ends, so it defers the indexes per ingest cycle instead:
+# they are only disabled while a cycle loads new files and readers get them back
+# as soon as the cycle is done.
+LOADER_TABLES = ['user', 'tweet', 'hashtag', 'mention', 'poll', 'poll_option', 'url', 'media']
+
+def get_loader_indexes(disabled=None):
+    """
+    List the nonclustered idx_ indexes on the loader tables.
+    
+    Args:
+        disabled: Only return disabled (True) or enabled (False) indexes when set
+    
+    Returns:
+        list: (index name, table name) tuples
+    """
+    tables = ", ".join(f"'{table}'" for table in LOADER_TABLES)
+    query = f"""
+    SELECT i.name, OBJECT_NAME(i.object_id)
+    FROM sys.indexes i
+    WHERE i.type = 2 AND i.name LIKE 'idx[_]%'
+      AND OBJECT_SCHEMA_NAME(i.object_id) = 'dbo' AND OBJECT_NAME(i.object_id) IN ({tables})
+    """
+    if disabled is not None:
+        query += f" AND i.is_disabled = {int(disabled)}"
+    cursor.execute(query)
+    return [(row[0], row[1]) for row in cursor.fetchall()]
+
+def get_disabled_foreign_key_tables():
+    """List the loader tables that have a disabled foreign key."""
+    tables = ", ".join(f"'{table}'" for table in LOADER_TABLES)
+    cursor.execute(f"""
+    SELECT DISTINCT OBJECT_NAME(parent_object_id)
+    FROM sys.foreign_keys
+    WHERE is_disabled = 1 AND OBJECT_NAME(parent_object_id) IN ({tables})
+    """)
+    return [row[0] for row in cursor.fetchall()]
+
+def disable_indexes(foreign_keys=False):
+    """Disable the nonclustered indexes (and optionally foreign keys) of the loader tables."""
+    indexes = get_loader_indexes(disabled=False)
+    for index_name, table in indexes:
+        cursor.execute(f"ALTER INDEX {index_name} ON dbo.[{table}] DISABLE")
+    if foreign_keys:
+        for table in LOADER_TABLES:
+            cursor.execute(f"ALTER TABLE dbo.[{table}] NOCHECK CONSTRAINT ALL")
+    connection.commit()
+    
+    message = f"Disabled {len(indexes)} indexes{' and the foreign keys' if foreign_keys else ''} for loading"
+    print(f"✓ {message}")
+    log_summary(message)
+
+def rebuild_indexes():
+    """
+    Rebuild every disabled loader index with a sorted bulk build, re-validate
+    disabled foreign keys and refresh the table statistics.
+    
+    Returns:
+        bool: True when all indexes and constraints are back in place
+    """
+    indexes = get_loader_indexes(disabled=True)
+    fk_tables = get_disabled_foreign_key_tables()
+    if not indexes and not fk_tables:
+        return True
+    
+    success = True
+    start = time.perf_counter()
+    for index_name, table in tqdm(indexes, desc="Rebuilding indexes", unit="index"):
+        try:
+            cursor.execute(f"ALTER INDEX {index_name} ON dbo.[{table}] REBUILD WITH (SORT_IN_TEMPDB = ON)")
+            connection.commit()
+        except Exception as e:
+            connection.rollback()
+            success = False
+            print(f"! Could not rebuild index {index_name}: {e}")
+            log_summary(f"Could not rebuild index {index_name}: {e}")
+    
+    for table in fk_tables:
+        try:
+            # WITH CHECK validates existing rows, so the optimizer can trust the constraints again
+            cursor.execute(f"ALTER TABLE dbo.[{table}] WITH CHECK CHECK CONSTRAINT ALL")
+            connection.commit()
+        except Exception as e:
+            connection.rollback()
+            success = False
+            print(f"! Could not re-enable the foreign keys of {table}: {e}")
+            log_summary(f"Could not re-enable the foreign keys of {table}: {e}")
+    
+    # Rebuilds refresh their own statistics; this covers the primary keys and column statistics
+    for table in sorted({table for _, table in indexes} | set(fk_tables)):
+        cursor.execute(f"UPDATE STATISTICS dbo.[{table}]")
+    connection.commit()
+    
+    message = (f"Rebuilt {len(indexes)} indexes and re-enabled foreign keys on {len(fk_tables)} tables "
+               f"in {time.perf_counter() - start:.1f}s")
+    print(f"✓ {message}" if success else f"! {message}, with errors")
+    log_summary(message if success else f"{message}, with errors")
+    return success
+
+def restore_interrupted_indexes():
+    """Rebuild indexes and foreign keys that an interrupted deferred-index load left disabled."""
+    if get_loader_indexes(disabled=True) or get_disabled_foreign_key_tables():
+        print("! Found indexes or foreign keys left disabled by an interrupted load, rebuilding them")
+        log_summary("Rebuilding indexes left disabled by an interrupted load")
+        return rebuild_indexes()
+    return True
+
+def add_user_snapshot(users, row):
+    """
+    Add a user row to a batch keyed by user id, keeping only the latest snapshot:
+    the one seen last, as data files hold tweets in the order they were collected.
+    """
+    users[row[0]] = row
+
+# Change detection for users: a side database next to the logs remembers a hash
+# of the last row written per user, so repeated snapshots are not merged again.
+# New hashes are only stored after the database commit that wrote the rows.
+user_cache = None
+pending_user_hashes = {}
+
+def open_user_cache():
+    """Open the user row cache for this process; worker processes open their own on first use."""
+    global user_cache
+    if user_cache is None:
+        user_cache = sqlite3.connect(user_cache_path, timeout=60)
+        user_cache.execute("PRAGMA journal_mode=WAL")
+        user_cache.execute("CREATE TABLE IF NOT EXISTS user_hash (id INTEGER PRIMARY KEY, hash INTEGER NOT NULL)")
+        user_cache.execute("CREATE TABLE IF NOT EXISTS cache_info (key TEXT PRIMARY KEY, value TEXT)")
+    return user_cache
+
+def close_user_cache():
+    """
+    Close this process's user row cache connection. Called before worker
+    processes are forked, as an SQLite connection must never be used by a
+    process other than the one that opened it.
+    """
+    global user_cache
+    if user_cache is not None:
+        user_cache.close()
+        user_cache = None
+
+def get_database_identity(cursor):
+    """Identify the target database, including its creation date, so a recreated database is noticed."""
+    cursor.execute("""
+        SELECT @@SERVERNAME, DB_NAME(), CONVERT(NVARCHAR(30), create_date, 126)
+        FROM sys.databases WHERE name = DB_NAME()
+    """)
+    return '/'.join(str(value) for value in cursor.fetchone())
+
+def validate_user_cache(database_identity, reset=False):
+    """Clear the user row cache when it was built for another database or a reset is requested."""
+    cache = open_user_cache()
+    row = cache.execute("SELECT value FROM cache_info WHERE key = 'database'").fetchone()
+    if reset or not row or row[0] != database_identity:
+        cache.execute("DELETE FROM user_hash")
+        cache.execute("INSERT OR REPLACE INTO cache_info (key, value) VALUES ('database', ?)", (database_identity,))
+        cache.commit()
+        log_summary("User row cache cleared")
+
+def user_row_hash(row):
+    """Hash a user row into a signed 64 bit integer."""
+    digest = hashlib.blake2b(repr(row).encode('utf8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+def filter_changed_users(users):
+    """Drop users whose row equals the last one written and remember the new hashes."""
+    if not USER_CACHE:
+        return users
+    
+    cache = open_user_cache()
+    hashes = {row[0]: user_row_hash(row) for row in users}
+    ids = list(hashes)
+    known = {}
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        known.update(cache.execute(
+            f"SELECT id, hash FROM user_hash WHERE id IN ({','.join('?' * len(chunk))})", chunk
+        ).fetchall())
+    
+    changed = [row for row in users if known.get(row[0]) != hashes[row[0]]]
+    for row in changed:
+        pending_user_hashes[row[0]] = hashes[row[0]]
+    
+    load_stats['users_checked'] += len(users)
+    load_stats['users_unchanged'] += len(users) - len(changed)
+    return changed
+
+def commit_user_cache():
+    """Store the hashes of users written since the last commit."""
+    if not pending_user_hashes:
+        return
+    cache = open_user_cache()
+    cache.executemany("INSERT OR REPLACE INTO user_hash (id, hash) VALUES (?, ?)", pending_user_hashes.items())
+    cache.commit()
+    pending_user_hashes.clear()
+
+# Duplicate tweet suppression: a Bloom filter on disk holds a hash of every tweet
+# row already written, shared by all files, runs and writer processes. A hit only
+# means "probably loaded"; hits are confirmed with one lookup per batch of the
+# compact tweet.row_hash (a digest of the whole row, written with the row), and a
+# row is only skipped when the stored hash is identical, so a false positive can
+# never drop a new or changed tweet. Rows loaded before row_hash existed have
+# NULL there and are written again once. Bits are set after
+# the database commit; concurrent writers may occasionally lose a bit, which only
+# costs an extra MERGE later.
+BLOOM_HEADER = struct.Struct('<4sIQ32s')  # magic, hash count, bit count, database identity hash
+tweet_bloom = None
+pending_tweet_bits = []
+bloom_lock = threading.Lock()
+
+def pending_bloom_bits():
+    """Bloom bits written by the current shard writer thread, or by the process, but not committed yet."""
+    return getattr(shard_state, 'tweet_bits', pending_tweet_bits)
+
+def database_identity_digest(database_identity):
+    """Hash a database identity to a fixed size for the Bloom filter header."""
+    return hashlib.blake2b(database_identity.encode('utf8'), digest_size=32).digest()
+
+def open_tweet_bloom():
+    """Open (and create if needed) the memory-mapped tweet Bloom filter for this process."""
+    global tweet_bloom
+    if tweet_bloom is None:
+        if not os.path.exists(tweet_bloom_path):
+            reset_tweet_bloom(b'')
+        with open(tweet_bloom_path, 'r+b') as bloom_file:
+            tweet_bloom = mmap.mmap(bloom_file.fileno(), 0)
+    return tweet_bloom
+
+def reset_tweet_bloom(identity_digest):
+    """Create an empty Bloom filter sized for BLOOM_CAPACITY rows at BLOOM_ERROR_RATE."""
+    global tweet_bloom
+    if tweet_bloom is not None:
+        tweet_bloom.close()
+        tweet_bloom = None
+    bits = int(-BLOOM_CAPACITY * math.log(BLOOM_ERROR_RATE) / math.log(2) ** 2)
+    bits += -bits % 8
+    hash_count = max(1, round(bits / BLOOM_CAPACITY * math.log(2)))
+    with open(tweet_bloom_path, 'wb') as bloom_file:
+        bloom_file.write(BLOOM_HEADER.pack(b'TWBL', hash_count, bits, identity_digest.ljust(32, b'\0')))
+        bloom_file.truncate(BLOOM_HEADER.size + bits // 8)
+
+def validate_tweet_bloom(database_identity, reset=False):
+    """Start a new Bloom filter when the current one was built for another database or a reset is requested."""
+    identity_digest = database_identity_digest(database_identity)
+    bloom = open_tweet_bloom()
+    if reset or BLOOM_HEADER.unpack_from(bloom, 0)[3] != identity_digest:
+        reset_tweet_bloom(identity_digest)
+        open_tweet_bloom()
+        log_summary("Tweet Bloom filter cleared")
+
+def tweet_bloom_positions(row):
+    """Bit positions of a tweet row, derived from the two 64 bit halves of its row hash (double hashing)."""
+    _, hash_count, bits, _ = BLOOM_HEADER.unpack_from(tweet_bloom, 0)
+    digest = row[-1]
+    h1 = int.from_bytes(digest[:8], 'little')
+    h2 = int.from_bytes(digest[8:], 'little') | 1
+    return [(h1 + i * h2) % bits for i in range(hash_count)]
+
+def filter_new_tweets(cursor, tweets):
+    """Drop tweets that are already loaded with exactly the same row."""
+    if not TWEET_FILTER:
+        return tweets
+    
+    bloom = open_tweet_bloom()
+    positions = [tweet_bloom_positions(row) for row in tweets]
+    candidates = [row[0] for row, bits in zip(tweets, positions)
+                  if all(bloom[BLOOM_HEADER.size + bit // 8] & (1 << (bit % 8)) for bit in bits)]
+    
+    # Confirm that the candidates are stored with exactly the same row before skipping
+    # them; only the narrow (id, row_hash) pairs are read, never the text
+    stored = {}
+    for i in range(0, len(candidates), 1000):
+        chunk = candidates[i:i + 1000]
+        cursor.execute(f"SELECT id, row_hash FROM dbo.tweet WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+        stored.update((tweet_id, row_hash) for tweet_id, row_hash in cursor.fetchall() if row_hash is not None)
+    
+    new_tweets = []
+    pending_bits = pending_bloom_bits()
+    for row, bits in zip(tweets, positions):
+        if stored.get(row[0]) == row[-1]:
+            continue
+        new_tweets.append(row)
+        pending_bits.extend(bits)
+    
+    stats = run_stats()
+    stats['tweets_checked'] += len(tweets)
+    stats['tweets_bloom_hits'] += len(candidates)
+    stats['tweets_skipped'] += len(tweets) - len(new_tweets)
+    return new_tweets
+
+def commit_tweet_bloom():
+    """Add the tweets written since the last commit to the Bloom filter."""
+    pending_bits = pending_bloom_bits()
+    if not pending_bits:
+        return
+    bloom = open_tweet_bloom()
+    with bloom_lock:
+        for bit in pending_bits:
+            index = BLOOM_HEADER.size + bit // 8
+            bloom[index] = bloom[index] | (1 << (bit % 8))
+        bloom.flush()
+    pending_bits.clear()
+
+def commit_batches(conn):
+    """Commit written batches and then the side caches that describe them."""
+    start = time.perf_counter()
+    conn.commit()
+    record_latency('commit', time.perf_counter() - start)
+    commit_user_cache()
+    commit_tweet_bloom()
+
+def dedupe_by_id(rows):
+    """Keep only the last row for every id (the first column), preserving order."""
+    return list({row[0]: row for row in rows}.values())
+
+def ensure_staging_tables(cursor):
+    """
+    Create the session-scoped staging tables used by the bulk MERGE path. They
+    are clustered on id, so every MERGE reads its source, and locks the target
+    rows, in key order.
+    """
+    cursor.execute("""
+    IF OBJECT_ID('tempdb..#user_stage') IS NULL
+    CREATE TABLE #user_stage (
+        id BIGINT NOT NULL PRIMARY KEY,
+        name NVARCHAR(100) NOT NULL,
+        screen_name NVARCHAR(50),
+        description NVARCHAR(MAX),
+        verified BIT,
+        followers_count INT,
+        friends_count INT,
+        listed_count INT,
+        favorites_count INT,
+        status_count INT
+    );
+    IF OBJECT_ID('tempdb..#tweet_stage') IS NULL
+    CREATE TABLE #tweet_stage (
+        id BIGINT NOT NULL PRIMARY KEY,
+        text NVARCHAR(MAX),
+        created_at DATETIME,
+        in_reply_to_status_id BIGINT,
+        in_reply_to_user BIGINT,
+        user_id BIGINT NOT NULL,
+        quoted_status_id BIGINT,
+        retweeted_id BIGINT,
+        quote_count INT,
+        reply_count INT,
+        retweet_count INT,
+        favorite_count INT,
+        possibly_sensitive BIT,
+        language NVARCHAR(10),
+        sentiment FLOAT,
+        norm_text NVARCHAR(MAX),
+        issue_mask INT,
+        dm_mention BIT,
+        row_hash BINARY(16)
+    );
+    """)
+
+# Parameter types for the staging inserts. Temp tables cannot be described by
+# the driver, and NVARCHAR(MAX) columns need size 0 to be streamed instead of
+# being allocated at their maximum size for every row.
+USER_STAGE_SIZES = [
+    (pyodbc.SQL_BIGINT, 0, 0), (pyodbc.SQL_WVARCHAR, 100, 0), (pyodbc.SQL_WVARCHAR, 50, 0),
+    (pyodbc.SQL_WVARCHAR, 0, 0), (pyodbc.SQL_BIT, 0, 0), (pyodbc.SQL_INTEGER, 0, 0),
+    (pyodbc.SQL_INTEGER, 0, 0), (pyodbc.SQL_INTEGER, 0, 0), (pyodbc.SQL_INTEGER, 0, 0),
+    (pyodbc.SQL_INTEGER, 0, 0)
+]
+TWEET_STAGE_SIZES = [
+    (pyodbc.SQL_BIGINT, 0, 0), (pyodbc.SQL_WVARCHAR, 0, 0), (pyodbc.SQL_TYPE_TIMESTAMP, 23, 3),
+    (pyodbc.SQL_BIGINT, 0, 0), (pyodbc.SQL_BIGINT, 0, 0), (pyodbc.SQL_BIGINT, 0, 0),
+    (pyodbc.SQL_BIGINT, 0, 0), (pyodbc.SQL_BIGINT, 0, 0), (pyodbc.SQL_INTEGER, 0, 0),
+    (pyodbc.SQL_INTEGER, 0, 0), (pyodbc.SQL_INTEGER, 0, 0), (pyodbc.SQL_INTEGER, 0, 0),
+    (pyodbc.SQL_BIT, 0, 0), (pyodbc.SQL_WVARCHAR, 10, 0), (pyodbc.SQL_FLOAT, 0, 0),
+    (pyodbc.SQL_WVARCHAR, 0, 0), (pyodbc.SQL_INTEGER, 0, 0), (pyodbc.SQL_BIT, 0, 0),
+    (pyodbc.SQL_BINARY, 16, 0)
+]
+
+def stage_rows(cursor, insert_sql, sizes, rows):
+    """Stream rows into a staging table with fast_executemany."""
+    cursor.fast_executemany = True
+    cursor.setinputsizes(sizes)
+    try:
+        cursor.executemany(insert_sql, rows)
+    finally:
+        cursor.setinputsizes(None)
+        cursor.fast_executemany = False
+
+def count_merge_actions(cursor, table):
+    """Add the inserted and updated row counts returned by a bulk MERGE to the run counters."""
+    row = cursor.fetchone()
+    if row:
+        stats = run_stats()
+        stats[f"inserted:{table}"] += row[0] or 0
+        stats[f"updated:{table}"] += row[1] or 0
+
+def ensure_merge_actions_table(cursor):
+    """
+    Create the session-scoped table the row-wise MERGEs write their $action to.
+    executemany cannot return an OUTPUT result set per row, so the actions are
+    collected here and counted once per batch.
+    """
+    cursor.execute("""
+    IF OBJECT_ID('tempdb..#merge_actions') IS NULL
+    CREATE TABLE #merge_actions (action NVARCHAR(10) NOT NULL);
+    """)
+
+def count_row_merge_actions(cursor, table):
+    """Add the actions collected in #merge_actions to the run counters and clear them."""
+    cursor.execute("""
+        SET NOCOUNT ON;
+        SELECT SUM(CASE WHEN action = 'INSERT' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN action = 'UPDATE' THEN 1 ELSE 0 END)
+        FROM #merge_actions;
+        TRUNCATE TABLE #merge_actions;
+    """)
+    count_merge_actions(cursor, table)
+
+def bulk_merge_users(cursor, users):
+    """Insert or update a batch of users with one set-based MERGE from a staging table."""
+    users = sorted(dedupe_by_id(users), key=lambda user: user[0])
+    ensure_staging_tables(cursor)
+    stage_rows(cursor, """
+        INSERT INTO #user_stage (id, name, screen_name, description, verified, followers_count, friends_count, listed_count, favorites_count, status_count)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+    """, USER_STAGE_SIZES, users)
+    
+    cursor.execute("""
+        SET NOCOUNT ON;
+        DECLARE @actions TABLE (action NVARCHAR(10));
+        MERGE dbo.[user] WITH (HOLDLOCK) AS target
+        USING #user_stage AS source
+        ON target.id = source.id
+        WHEN MATCHED THEN
+            UPDATE SET 
+                name = source.name,
+                screen_name = source.screen_name,
+                description = source.description,
+                verified = source.verified,
+                followers_count = source.followers_count,
+                friends_count = source.friends_count,
+                listed_count = source.listed_count,
+                favorites_count = source.favorites_count,
+                status_count = source.status_count
+        WHEN NOT MATCHED THEN
+            INSERT (id, name, screen_name, description, verified, followers_count, friends_count, listed_count, favorites_count, status_count)
+            VALUES (source.id, source.name, source.screen_name, source.description, source.verified, source.followers_count, source.friends_count, source.listed_count, source.favorites_count, source.status_count)
+        OUTPUT $action INTO @actions;
+        TRUNCATE TABLE #user_stage;
+        SELECT SUM(CASE WHEN action = 'INSERT' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN action = 'UPDATE' THEN 1 ELSE 0 END)
+        FROM @actions;
+    """)
+    count_merge_actions(cursor, 'user')
+
+def bulk_merge_tweets(cursor, tweets):
+    """Insert or update a batch of tweets with one set-based MERGE from a staging table."""
+    tweets = sorted(dedupe_by_id(tweets), key=lambda tweet: tweet[0])
+    ensure_staging_tables(cursor)
+    stage_rows(cursor, """
+        INSERT INTO #tweet_stage (id, text, created_at, in_reply_to_status_id, in_reply_to_user, 
+                                  user_id, quoted_status_id, retweeted_id, quote_count, reply_count, retweet_count, 
+                                  favorite_count, possibly_sensitive, language, sentiment,
+                                  norm_text, issue_mask, dm_mention, row_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+    """, TWEET_STAGE_SIZES, tweets)
+    
+    layout = get_tweet_text_layout(cursor)
+    text_merge = "" if layout == 'inline' else tweet_text_merge_sql("#tweet_stage AS source", layout)
+    cursor.execute(f"""
+        SET NOCOUNT ON;
+        DECLARE @actions TABLE (action NVARCHAR(10));
+        {tweet_merge_sql("#tweet_stage AS source", tweet_columns(layout))}
+        OUTPUT $action INTO @actions;
+        {text_merge}
+        TRUNCATE TABLE #tweet_stage;
+        SELECT SUM(CASE WHEN action = 'INSERT' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN action = 'UPDATE' THEN 1 ELSE 0 END)
+        FROM @actions;
+    """)
+    count_merge_actions(cursor, 'tweet')
+
 def load_users_batch(cursor, users):
     """Insert or update user data in the database in batches."""
+    users = filter_changed_users(users)
     if not users:
         return
+    # Concurrent writers lock the same users in the same order, so they queue instead of deadlocking
+    users = sorted(users, key=lambda user: user[0])
+    if BULK_MERGE:
+        return bulk_merge_users(cursor, users)
 
+    # HOLDLOCK keeps the key range locked between the match and the insert, so two
+    # writers cannot both insert a new user
+    ensure_merge_actions_table(cursor)
     cursor.executemany("""
-        MERGE dbo.[user] AS target
+        MERGE dbo.[user] WITH (HOLDLOCK) AS target
         USING (SELECT ? AS id, ? AS name, ? AS screen_name, ? AS description, ? AS verified, ? AS followers_count, ? AS friends_count, ? AS listed_count, ? AS favorites_count, ? AS status_count) AS source
         ON target.id = source.id
         WHEN MATCHED THEN
@@ -349,211 +2413,1237 @@ def load_users_batch(cursor, users):
                 status_count = source.status_count
         WHEN NOT MATCHED THEN
             INSERT (id, name, screen_name, description, verified, followers_count, friends_count, listed_count, favorites_count, status_count)
-            VALUES (source.id, source.name, source.screen_name, source.description, source.verified, source.followers_count, source.friends_count, source.listed_count, source.favorites_count, source.status_count);
+            VALUES (source.id, source.name, source.screen_name, source.description, source.verified, source.followers_count, source.friends_count, source.listed_count, source.favorites_count, source.status_count)
+        OUTPUT $action INTO #merge_actions;
     """, users)
+    count_row_merge_actions(cursor, 'user')
     
+def tweet_merge_sql(source, columns):
+    """
+    MERGE statement that inserts or updates dbo.tweet from a source with the given
+    columns. HOLDLOCK keeps concurrent writers from inserting the same new id.
+    """
+    updates = ",\n                ".join(f"{column} = source.{column}" for column in columns[1:])
+    return f"""
+        MERGE dbo.tweet WITH (HOLDLOCK) AS target
+        USING {source}
+        ON target.id = source.id
+        WHEN MATCHED THEN
+            UPDATE SET 
+                {updates}
+        WHEN NOT MATCHED THEN
+            INSERT ({", ".join(columns)})
+            VALUES ({", ".join(f"source.{column}" for column in columns)})"""
+
+def tweet_text_merge_sql(source, layout):
+    """MERGE statement that stores the text of every source tweet in dbo.tweet_text."""
+    column, value = ('text_compressed', 'COMPRESS(source.text)') if layout == 'compressed' else ('text', 'source.text')
+    return f"""
+        MERGE dbo.tweet_text WITH (HOLDLOCK) AS target
+        USING {source}
+        ON target.id = source.id
+        WHEN MATCHED AND source.text IS NOT NULL THEN
+            UPDATE SET {column} = {value}, norm_text = source.norm_text
+        WHEN NOT MATCHED AND source.text IS NOT NULL THEN
+            INSERT (id, {column}, norm_text)
+            VALUES (source.id, {value}, source.norm_text);"""
+
+def tweet_columns(layout):
+    """Columns of dbo.tweet in a text layout."""
+    return TWEET_COLUMNS if layout == 'inline' else [TWEET_COLUMNS[i] for i in CORE_POSITIONS]
+
 def load_tweets_batch(cursor, tweets):
     """Insert or update tweet data in the database in batches."""
+    tweets = filter_new_tweets(cursor, tweets)
     if not tweets:
         return
+    if is_tweet_partitioned(cursor):
+        # Month order lets each statement fill one partition's delta store after the other
+        tweets = sorted(tweets, key=lambda tweet: (tweet[2] or datetime.min, tweet[0]))
+    else:
+        # Concurrent writers lock the same tweets in the same order
+        tweets = sorted(tweets, key=lambda tweet: tweet[0])
+    if BULK_MERGE:
+        return bulk_merge_tweets(cursor, tweets)
 
-    cursor.executemany("""
-        MERGE dbo.tweet AS target
-        USING (SELECT ? AS id, ? AS text, ? AS created_at, ? AS in_reply_to_status_id, ? AS in_reply_to_user, 
-                      ? AS user_id, ? AS quoted_status_id, ? AS retweeted_id, 
-                      ? AS quote_count, ? AS reply_count, ? AS retweet_count, ? AS favorite_count, 
-                      ? AS possibly_sensitive, ? AS language, ? AS sentiment) AS source
-        ON target.id = source.id
-        WHEN MATCHED THEN
-            UPDATE SET 
-                text = source.text,
-                created_at = source.created_at,
-                in_reply_to_status_id = source.in_reply_to_status_id,
-                in_reply_to_user = source.in_reply_to_user,
-                user_id = source.user_id,
-                quoted_status_id = source.quoted_status_id,
-                retweeted_id = source.retweeted_id,
-                quote_count = source.quote_count,
-                reply_count = source.reply_count,
-                retweet_count = source.retweet_count,
-                favorite_count = source.favorite_count,
-                possibly_sensitive = source.possibly_sensitive,
-                language = source.language,
-                sentiment = source.sentiment
-        WHEN NOT MATCHED THEN
-            INSERT (id, text, created_at, in_reply_to_status_id, in_reply_to_user, 
-                    user_id, quoted_status_id, retweeted_id, quote_count, reply_count, retweet_count, 
-                    favorite_count, possibly_sensitive, language, sentiment)
-            VALUES (source.id, source.text, source.created_at, source.in_reply_to_status_id, source.in_reply_to_user, 
-                    source.user_id, source.quoted_status_id, source.retweeted_id, source.quote_count, source.reply_count, 
-                    source.retweet_count, source.favorite_count, source.possibly_sensitive, source.language, source.sentiment);
-    """, tweets)
+    layout = get_tweet_text_layout(cursor)
+    columns = tweet_columns(layout)
+    source = "(SELECT " + ", ".join(f"? AS {column}" for column in columns) + ") AS source"
+    merge_sql = tweet_merge_sql(source, columns) + "\n        OUTPUT $action INTO #merge_actions;"
+    ensure_merge_actions_table(cursor)
+    if layout == 'inline':
+        cursor.executemany(merge_sql, tweets)
+    else:
+        # The text goes to dbo.tweet_text after its tweet row exists
+        cursor.executemany(merge_sql, [tuple(tweet[i] for i in CORE_POSITIONS) for tweet in tweets])
+        cursor.executemany(tweet_text_merge_sql("(SELECT ? AS id, ? AS text, ? AS norm_text) AS source", layout),
+                           [tuple(tweet[i] for i in TEXT_POSITIONS) for tweet in tweets])
+    count_row_merge_actions(cursor, 'tweet')
+    
+# Entity dictionaries. Hashtag texts and mentioned screen names are stored once
+# in hashtag_text and mention_name, keyed by their lowercase form, and entity rows
+# only hold the dictionary id. Known ids are cached in memory per process; new
+# values are upserted in bulk through a separate autocommit connection, so ids
+# are committed before any entity row refers to them and every writer session
+# (shard threads, writer processes) can use them at once.
+ENTITY_DICTIONARIES = {
+    'hashtag': ('hashtag_text', 'text', 280),
+    'mention': ('mention_name', 'name', 100)
+}
+entity_ids = {'hashtag': {}, 'mention': {}}
+dictionary_connection = None
+dictionary_cursor = None
+dictionary_lock = threading.Lock()
+
+def normalize_entity(value):
+    """Dictionary key of a hashtag text or screen name."""
+    return value.lower()
+
+def upsert_entity_values(kind, values):
+    """Insert missing dictionary values in one statement and cache the ids of all given values."""
+    global dictionary_connection, dictionary_cursor
+    if dictionary_connection is None:
+        dictionary_connection, dictionary_cursor = open_connection()
+        dictionary_connection.autocommit = True
+    
+    table, column, length = ENTITY_DICTIONARIES[kind]
+    dictionary_cursor.execute(f"""
+    IF OBJECT_ID('tempdb..#{table}_stage') IS NULL
+    CREATE TABLE #{table}_stage (
+        normalized NVARCHAR({length}) COLLATE Latin1_General_100_BIN2 NOT NULL,
+        value NVARCHAR({length}) NOT NULL
+    );
+    """)
+    stage_rows(dictionary_cursor, f"INSERT INTO #{table}_stage (normalized, value) VALUES (?, ?);",
+               [(pyodbc.SQL_WVARCHAR, length, 0), (pyodbc.SQL_WVARCHAR, length, 0)], list(values.items()))
+    
+    # The lock hints keep concurrent writer processes from inserting the same value twice
+    dictionary_cursor.execute(f"""
+    INSERT INTO dbo.{table} (normalized, {column})
+    SELECT s.normalized, MIN(s.value)
+    FROM #{table}_stage s
+    WHERE NOT EXISTS (SELECT 1 FROM dbo.{table} d WITH (UPDLOCK, HOLDLOCK) WHERE d.normalized = s.normalized)
+    GROUP BY s.normalized;
+    """)
+    dictionary_cursor.execute(f"""
+    SELECT d.normalized, d.id
+    FROM dbo.{table} d
+    JOIN #{table}_stage s ON s.normalized = d.normalized;
+    """)
+    entity_ids[kind].update((row[0], row[1]) for row in dictionary_cursor.fetchall())
+    dictionary_cursor.execute(f"TRUNCATE TABLE #{table}_stage;")
+
+def get_entity_ids(kind, values):
+    """Get the dictionary ids for hashtag texts or screen names, adding new ones."""
+    ids = entity_ids[kind]
+    missing = {}
+    for value in values:
+        key = normalize_entity(value)
+        if key not in ids and key not in missing:
+            missing[key] = value
+    if missing:
+        with dictionary_lock:
+            missing = {key: value for key, value in missing.items() if key not in ids}
+            if missing:
+                upsert_entity_values(kind, missing)
+    return ids
+
+def insert_new_entities(cursor, table, rows):
+    """
+    Insert the entity rows whose key (see ENTITY_TABLES) is not in the table yet,
+    through a staging table and one anti-join INSERT. Rows repeated within the
+    batch are inserted once.
+    """
+    definition = ENTITY_TABLES[table]
+    names = ", ".join(column for column, _, _ in definition['columns'])
+    stage_columns = ", ".join(f"{column} {sql_type}" for column, sql_type, _ in definition['columns'])
+    cursor.execute(f"""
+    IF OBJECT_ID('tempdb..#{table}_load') IS NULL
+    CREATE TABLE #{table}_load ({stage_columns});
+    """)
+    placeholders = ", ".join("?" for _ in definition['columns'])
+    stage_rows(cursor, f"INSERT INTO #{table}_load ({names}) VALUES ({placeholders});",
+               [size for _, _, size in definition['columns']], rows)
     
+    # INTERSECT compares the key positions with NULLs equal, as the unique index
+    # does; the lock hints keep concurrent writers from inserting a key twice
+    key = definition['key']
+    condition = "t.tweet_id = s.tweet_id"
+    if len(key) > 1:
+        rest = key[1:]
+        condition += (f" AND EXISTS (SELECT {', '.join(f't.{column}' for column in rest)}"
+                      f" INTERSECT SELECT {', '.join(f's.{column}' for column in rest)})")
+    cursor.execute(f"""
+        SET NOCOUNT ON;
+        DECLARE @inserted INT;
+        INSERT INTO dbo.{table} ({names})
+        SELECT {names}
+        FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY {", ".join(key)} ORDER BY (SELECT NULL)) AS copy
+              FROM #{table}_load) s
+        WHERE s.copy = 1
+          AND NOT EXISTS (SELECT 1 FROM dbo.{table} t WITH (UPDLOCK, HOLDLOCK) WHERE {condition});
+        SET @inserted = @@ROWCOUNT;
+        TRUNCATE TABLE #{table}_load;
+        SELECT @inserted, 0;
+    """)
+    count_merge_actions(cursor, table)
+
 def load_hashtags_batch(cursor, hashtags):
-    """Insert hashtag data in the database in batches without checking for duplicates."""
+    """Insert the hashtags of a batch that are not loaded yet."""
     if not hashtags:
         return
 
-    cursor.executemany("""
-        INSERT INTO dbo.hashtag (text, indices, tweet_id)
-        VALUES (?, ?, ?);
-    """, hashtags)
+    text_ids = get_entity_ids('hashtag', [hashtag[1] for hashtag in hashtags])
+    insert_new_entities(cursor, 'hashtag', [(tweet_id, text_ids[normalize_entity(text)], start, end)
+                                            for tweet_id, text, start, end in hashtags])
     
 def load_mentions_batch(cursor, mentions):
-    """Insert mention data in the database in batches without checking for duplicates."""
+    """Insert the mentions of a batch that are not loaded yet."""
     if not mentions:
         return
 
-    cursor.executemany("""
-        INSERT INTO dbo.mention (indices, tweet_id, name)
-        VALUES (?, ?, ?);
-    """, mentions)
+    name_ids = get_entity_ids('mention', [mention[1] for mention in mentions])
+    insert_new_entities(cursor, 'mention', [(tweet_id, name_ids[normalize_entity(name)], start, end, user_id)
+                                            for tweet_id, name, start, end, user_id in mentions])
+
+def load_polls_batch(cursor, polls):
+    """Insert the polls of a batch that are not loaded yet."""
+    if polls:
+        insert_new_entities(cursor, 'poll', polls)
+
+def load_poll_options_batch(cursor, options):
+    """Insert the poll options of a batch that are not loaded yet."""
+    if options:
+        insert_new_entities(cursor, 'poll_option', options)
+
+def load_urls_batch(cursor, urls):
+    """Insert the links of a batch that are not loaded yet."""
+    if urls:
+        insert_new_entities(cursor, 'url', urls)
+
+def load_media_batch(cursor, media):
+    """Insert the media of a batch that are not loaded yet."""
+    if media:
+        insert_new_entities(cursor, 'media', media)
+
+# Registry of entity types. All extractors run in the same pass over the data,
+# and every type has its own buffer (bounded by batch_limit(name)) and bulk
+# loader, so adding a type never costs another scan of the corpus. Types are
+# written after their tweets, in this order. 'store' names the Parquet column
+# and the fields that hold the row after its tweet id.
+ENTITY_EXTRACTORS = {
+    'hashtag': {'extract': extract_hashtags, 'loader': load_hashtags_batch,
+                'store': ('hashtags', ('text', 'start_idx', 'end_idx'))},
+    'mention': {'extract': extract_mentions, 'loader': load_mentions_batch,
+                'store': ('mentions', ('screen_name', 'start_idx', 'end_idx', 'id'))},
+    'poll': {'extract': extract_polls, 'loader': load_polls_batch,
+             'store': ('polls', ('end_datetime', 'duration_minutes'))},
+    'poll_option': {'extract': extract_poll_options, 'loader': load_poll_options_batch,
+                    'store': ('poll_options', ('position', 'text'))},
+    'url': {'extract': extract_urls, 'loader': load_urls_batch,
+            'store': ('urls', ('expanded_url', 'start_idx', 'end_idx'))},
+    'media': {'extract': extract_media, 'loader': load_media_batch,
+              'store': ('media', ('media_id', 'type', 'media_url', 'start_idx', 'end_idx'))}
+}
+
+def write_entities(cursor, entities):
+    """Write the buffered rows of every entity type with its own loader."""
+    for name, rows in entities.items():
+        write_batch(name, ENTITY_EXTRACTORS[name]['loader'], cursor, rows)
+
+# Sharded writers for the tweet and entity stages. Rows are split over
+# WRITER_SHARDS threads by a hash of the tweet id, each with its own connection,
+# so concurrent MERGEs never touch the same key and one session's log flushes
+# and round trips no longer bound the stage. Users are complete before these
+# stages start, so the foreign keys hold in every shard. A checkpoint is sent to
+# every shard as a marker; each shard commits when it reaches the marker, and
+# the checkpoint is recorded once all shards have committed it. The pool lives
+# for one stage and is drained before the next stage starts. Every shard keeps
+# its own counters and pending Bloom bits (shard_state) and sends its counters
+# along with each acknowledgement.
+def shard_writer(shard_queue, ack_queue):
+    """Write the rows of one shard with a dedicated connection and commit at every marker."""
+    shard_state.stats = Counter()
+    shard_state.tweet_bits = []
+    shard_connection, shard_cursor = open_connection()
+    try:
+        while True:
+            item = shard_queue.get()
+            if item is None:
+                break
+            kind, payload = item
+            if kind == 'rows':
+                tweets, entities = payload
+                write_batch('tweet', load_tweets_batch, shard_cursor, tweets)
+                write_entities(shard_cursor, entities)
+            else:
+                commit_batches(shard_connection)
+                ack_queue.put((payload, shard_state.stats))
+                shard_state.stats = Counter()
+    except Exception as e:
+        shard_connection.rollback()
+        ack_queue.put(e)
+        # Keep draining so the coordinator never blocks on a full queue
+        while shard_queue.get() is not None:
+            pass
+    finally:
+        shard_cursor.close()
+        shard_connection.close()
+
+def start_writer_shards(count):
+    """Start a pool of shard writer threads."""
+    shards = {
+        'queues': [queue.Queue(maxsize=QUEUE_SIZE) for _ in range(count)],
+        'acks': queue.Queue(),
+        'markers': {},
+        'next_marker': 0,
+        'failed': None
+    }
+    shards['threads'] = [threading.Thread(target=shard_writer, args=(shard_queue, shards['acks']), daemon=True)
+                         for shard_queue in shards['queues']]
+    for thread in shards['threads']:
+        thread.start()
+    return shards
+
+def shard_index(tweet_id, count):
+    """Shard of a tweet id. Tweet ids are snowflakes with mostly zero low bits, so they are hashed first."""
+    return (((tweet_id * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 32) % count
+
+def submit_shard_rows(shards, tweets, entities):
+    """Split tweets and entities by tweet id and queue them on their shards."""
+    count = len(shards['queues'])
+    split = [([], {name: [] for name in entities}) for _ in range(count)]
+    for tweet in tweets:
+        split[shard_index(tweet[0], count)][0].append(tweet)
+    for name, rows in entities.items():
+        for row in rows:
+            split[shard_index(row[0], count)][1][name].append(row)
+    for shard_queue, (shard_tweets, shard_entities) in zip(shards['queues'], split):
+        if shard_tweets or any(shard_entities.values()):
+            shard_queue.put(('rows', (shard_tweets, shard_entities)))
+    collect_shard_acks(shards)
+
+def submit_shard_checkpoint(shards, json_file, stage, offset, line_number, done=False):
+    """Ask every shard to commit, and record the checkpoint once all of them did."""
+    marker = shards['next_marker']
+    shards['next_marker'] += 1
+    shards['markers'][marker] = [len(shards['queues']), (json_file, stage, offset, line_number, done)]
+    for shard_queue in shards['queues']:
+        shard_queue.put(('commit', marker))
+    collect_shard_acks(shards)
+
+def collect_shard_acks(shards, wait=False):
+    """Record the checkpoints that every shard has committed; with wait, until none are left."""
+    # A failed shard never acknowledges its markers again
+    if shards['failed'] is not None:
+        raise RuntimeError(f"Shard writer failed: {shards['failed']}")
+    while shards['markers']:
+        try:
+            ack = shards['acks'].get(block=wait)
+        except queue.Empty:
+            return
+        if isinstance(ack, Exception):
+            shards['failed'] = ack
+            raise RuntimeError(f"Shard writer failed: {ack}")
+        ack, stats = ack
+        load_stats.update(stats)
+        shards['markers'][ack][0] -= 1
+        if shards['markers'][ack][0] == 0:
+            # Shards handle markers in order, so checkpoints complete in order too
+            json_file, stage, offset, line_number, done = shards['markers'].pop(ack)[1]
+            record_checkpoint(json_file, stage, offset, line_number, done=done)
+            telemetry_checkpoint(json_file, stage, offset, line_number, done=done)
+
+def stop_writer_shards(shards, wait=True):
+    """
+    Wait until every shard has committed its checkpoints and stop the pool.
+    Without wait (after a failure) queued rows are dropped, which leaves them
+    uncommitted, and each thread gets SHARD_STOP_TIMEOUT seconds to finish.
+    """
+    try:
+        if wait:
+            collect_shard_acks(shards, wait=True)
+    finally:
+        for shard_queue in shards['queues']:
+            if not wait:
+                while True:
+                    try:
+                        shard_queue.get_nowait()
+                    except queue.Empty:
+                        break
+            shard_queue.put(None)
+        for thread in shards['threads']:
+            thread.join(timeout=None if wait else SHARD_STOP_TIMEOUT)
 
 # Process a single file for a specific stage
-def process_file(json_file, stage):
-    """Process a single JSON file for a specific stage (1=users, 2=tweets, 3=entities)."""
-    json_path = os.path.join(data_directory, json_file)
-    last_processed_line = progress[json_file][stage]
+def process_file(json_file, stage, shards=None):
+    """
+    Process a single JSON file for a specific stage (1=users, 2=tweets, 3=entities).
+    With a pool of writer shards, tweet and entity rows are written by the shards.
+    """
+    offset, last_processed_line, _ = get_checkpoint(json_file, stage)
+    telemetry_start(json_file, stage, offset, last_processed_line)
     
-    users_batch = []
+    users_batch = {}
     tweets_batch = []
-    all_hashtags = []
-    all_mentions = []
+    all_entities = new_entity_buffers()
     
-    line_number = 0
+    line_number = last_processed_line
     valid_lines = 0
     invalid_lines = 0
+    lines_since_commit = 0
+    commit_started = time.perf_counter()
     
-    stage_name = {1: "users", 2: "tweets", 3: "entities"}[stage]
+    stage_name = STAGE_NAMES[stage]
     
-    with open(json_path, 'r', encoding='utf8') as file:
-        # Count total lines for progress bar
-        if last_processed_line == 0:  # Only count if starting from beginning
-            total_lines = sum(1 for _ in open(json_path, 'r', encoding='utf8'))
-        else:
-            # Estimate remaining lines
-            total_lines = sum(1 for _ in open(json_path, 'r', encoding='utf8')) - last_processed_line
+    with open_data_file(json_file) as (file, raw):
+        # Jump straight to the last committed position
+        seek_data_stream(file, offset)
         
-        # Create progress bar
-        pbar = tqdm(total=total_lines, 
+        # Progress bar tracks bytes on disk, so the file never has to be counted first
+        pbar = tqdm(total=file_fingerprint(json_file)[0],
+                   initial=raw.tell(),
                    desc=f"[{stage_name.upper()}] {json_file}", 
-                   unit="lines",
+                   unit="B",
+                   unit_scale=True,
                    position=0)
-        
-        # Skip to last processed line
-        if last_processed_line > 0:
-            for _ in range(last_processed_line):
-                next(file, None)
                 
         for line_number, line in enumerate(file, start=last_processed_line+1):
-            pbar.update(1)
+            offset += len(line)
+            lines_since_commit += 1
+            if line_number % BATCH_SIZE == 0:
+                pbar.update(raw.tell() - pbar.n)
             
             try:
                 # Parse and clean data
-                data = json.loads(line)
+                data = decode_json(line)
                 
                 # Process users (stage 1)
                 if stage == 1:
                     clean_user = clean_user_object(data.get('user'))
                     if clean_user:
-                        users_batch.append((
-                            clean_user['id'],
-                            clean_user['name'],
-                            clean_user['screen_name'],
-                            clean_user['description'],
-                            clean_user['verified'],
-                            clean_user['followers_count'],
-                            clean_user['friends_count'],
-                            clean_user['listed_count'],
-                            clean_user['favorites_count'],
-                            clean_user['status_count']
-                        ))
+                        add_user_snapshot(users_batch, user_row(clean_user))
                 
                 # Process tweets (stage 2)
                 elif stage == 2:
                     clean_tweet = clean_tweet_object(data)
                     if clean_tweet:
-                        tweets_batch.append((
-                            clean_tweet['id'],
-                            clean_tweet['text'],
-                            clean_tweet['created_at'],
-                            clean_tweet['in_reply_to_status_id'],
-                            clean_tweet['in_reply_to_user'],
-                            clean_tweet['user_id'],
-                            clean_tweet['quoted_status_id'],
-                            clean_tweet['retweeted_id'],
-                            clean_tweet['quote_count'],
-                            clean_tweet['reply_count'],
-                            clean_tweet['retweet_count'],
-                            clean_tweet['favorite_count'],
-                            clean_tweet['possibly_sensitive'],
-                            clean_tweet['language'],
-                            clean_tweet['sentiment']
-                        ))
+                        tweets_batch.append(tweet_row(clean_tweet))
                 
                 # Process entities (stage 3)
                 elif stage == 3:
                     clean_tweet = clean_tweet_object(data)
                     if clean_tweet:
-                        hashtags, mentions = extract_entities(data, clean_tweet['id'])
-                        all_hashtags.extend(hashtags)
-                        all_mentions.extend(mentions)
+                        extend_entities(all_entities, extract_entities(data, clean_tweet['id']))
                 
                 valid_lines += 1
                 
                 # Process in batches to save memory
-                if len(users_batch) >= BATCH_SIZE and stage == 1:
-                    load_users_batch(cursor, users_batch)
-                    users_batch = []
+                if len(users_batch) >= batch_limit('user') and stage == 1:
+                    write_batch('user', load_users_batch, cursor, list(users_batch.values()))
+                    users_batch = {}
                         
-                if len(tweets_batch) >= BATCH_SIZE and stage == 2:
-                    load_tweets_batch(cursor, tweets_batch)
+                if len(tweets_batch) >= batch_limit('tweet') and stage == 2:
+                    if shards:
+                        submit_shard_rows(shards, tweets_batch, {})
+                    else:
+                        write_batch('tweet', load_tweets_batch, cursor, tweets_batch)
                     tweets_batch = []
                         
+                # Every entity type is written as soon as its own buffer is full
                 if stage == 3:
-                    if len(all_hashtags) >= BATCH_SIZE:
-                        load_hashtags_batch(cursor, all_hashtags)
-                        all_hashtags = []
-                        
-                    if len(all_mentions) >= BATCH_SIZE:
-                        load_mentions_batch(cursor, all_mentions)
-                        all_mentions = []
+                    full_entities = {name: rows for name, rows in all_entities.items() if len(rows) >= batch_limit(name)}
+                    if full_entities and shards:
+                        submit_shard_rows(shards, [], full_entities)
+                    elif full_entities:
+                        write_entities(cursor, full_entities)
+                    for name in full_entities:
+                        all_entities[name] = []
                         
-                # Commit periodically and update progress
-                if line_number % (BATCH_SIZE * 5) == 0:
-                    connection.commit()
-                    update_progress(json_file, stage, line_number)
+                # Commit periodically and update progress; pending rows are
+                # written first so the checkpoint never covers unwritten lines
+                if commit_due(lines_since_commit) and shards:
+                    submit_shard_rows(shards, tweets_batch, all_entities)
+                    tweets_batch, all_entities = [], new_entity_buffers()
+                    submit_shard_checkpoint(shards, json_file, stage, offset, line_number)
+                    lines_since_commit = 0
+                elif commit_due(lines_since_commit):
+                    flush_batches(cursor, list(users_batch.values()), tweets_batch, all_entities)
+                    users_batch, tweets_batch, all_entities = {}, [], new_entity_buffers()
+                    commit_batches(connection)
+                    record_checkpoint(json_file, stage, offset, line_number)
+                    telemetry_checkpoint(json_file, stage, offset, line_number)
+                    record_round_trip('commit', lines_since_commit, time.perf_counter() - commit_started)
+                    lines_since_commit = 0
+                    commit_started = time.perf_counter()
                     
-            except json.JSONDecodeError:
+            except DECODE_ERRORS:
                 invalid_lines += 1
                 continue  # Skip invalid JSON lines
                 
+        pbar.update(raw.tell() - pbar.n)
         pbar.close()
     
-    # Process any remaining items in batches
-    if stage == 1 and users_batch:
-        load_users_batch(cursor, users_batch)
+    if shards:
+        # The shards record the final checkpoint once they all committed
+        submit_shard_rows(shards, tweets_batch, all_entities)
+        submit_shard_checkpoint(shards, json_file, stage, offset, line_number, done=True)
+    else:
+        # Process any remaining items in batches
+        flush_batches(cursor, list(users_batch.values()), tweets_batch, all_entities)
         
-    if stage == 2 and tweets_batch:
-        load_tweets_batch(cursor, tweets_batch)
+        # Commit changes
+        commit_batches(connection)
         
-    if stage == 3:
-        if all_hashtags:
-            load_hashtags_batch(cursor, all_hashtags)
-        if all_mentions:
-            load_mentions_batch(cursor, all_mentions)
-    
-    # Commit changes
-    connection.commit()
-    
-    # Update final progress
-    update_progress(json_file, stage, line_number)
+        # Update final progress
+        record_checkpoint(json_file, stage, offset, line_number, done=True)
+        telemetry_checkpoint(json_file, stage, offset, line_number, done=True)
     
     # Log summary for this file and stage
     log_summary(f"Completed {stage_name} for {json_file}: {valid_lines} valid, {invalid_lines} invalid lines")
             
     return valid_lines, invalid_lines
 
+# Adaptive batching. Every table gets a controller (a plain dict) that keeps a
+# moving average of the seconds and estimated bytes per row of its round trips,
+# and sizes the next batches so one round trip takes about BATCH_TARGET_SECONDS
+# while the buffer stays below BATCH_MEMORY_LIMIT. The 'commit' controller does
+# the same for the number of lines between commits. Sizes move at most a factor
+# two per round trip; every notable change is written to logs/batch_tuning.log.
+batch_controllers = {}
+
+def get_batch_controller(name):
+    """Get the controller state for a table (or 'commit'), creating it with the static defaults."""
+    controller = batch_controllers.get(name)
+    if controller is None:
+        controller = batch_controllers[name] = {
+            'size': BATCH_SIZE * 5 if name == 'commit' else BATCH_SIZE,
+            'seconds_per_row': None,
+            'bytes_per_row': None,
+            'round_trips': 0
+        }
+    return controller
+
+def batch_limit(name):
+    """Number of rows (or lines, for 'commit') to buffer before writing."""
+    if not ADAPTIVE_BATCHES:
+        return BATCH_SIZE * 5 if name == 'commit' else BATCH_SIZE
+    return get_batch_controller(name)['size']
+
+def estimate_row_bytes(rows):
+    """Estimate the memory per row from a small sample of a batch."""
+    sample = rows[:20]
+    total = sum(sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row) for row in sample)
+    return total / len(sample)
+
+def log_batch_tuning(name, controller, rows, seconds, new_size, reason):
+    """Append one controller decision to the batch tuning log."""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    bytes_per_row = controller['bytes_per_row']
+    with open(batch_tuning_log_path, 'a') as log_file:
+        log_file.write(f"{timestamp}\t{name}\trows={rows}\tseconds={seconds:.3f}\t"
+                       f"ms_per_row={controller['seconds_per_row'] * 1000:.4f}\t"
+                       f"bytes_per_row={bytes_per_row or 0:.0f}\t"
+                       f"size={controller['size']}->{new_size}\treason={reason}\n")
+
+def record_round_trip(name, rows, seconds, row_bytes=None):
+    """Feed a measured round trip to a controller and resize its batches."""
+    if not ADAPTIVE_BATCHES or rows == 0:
+        return
+    controller = get_batch_controller(name)
+    controller['round_trips'] += 1
+    
+    rate = seconds / rows
+    if controller['seconds_per_row'] is None:
+        controller['seconds_per_row'] = rate
+    else:
+        controller['seconds_per_row'] = 0.7 * controller['seconds_per_row'] + 0.3 * rate
+    if row_bytes:
+        if controller['bytes_per_row'] is None:
+            controller['bytes_per_row'] = row_bytes
+        else:
+            controller['bytes_per_row'] = 0.7 * controller['bytes_per_row'] + 0.3 * row_bytes
+    
+    target = COMMIT_TARGET_SECONDS if name == 'commit' else BATCH_TARGET_SECONDS
+    size = target / max(controller['seconds_per_row'], 1e-9)
+    size = min(max(size, controller['size'] / 2), controller['size'] * 2)
+    reason = 'latency'
+    if controller['bytes_per_row'] and size * controller['bytes_per_row'] > BATCH_MEMORY_LIMIT:
+        size = BATCH_MEMORY_LIMIT / controller['bytes_per_row']
+        reason = 'memory'
+    if name != 'commit':
+        if size > MAX_BATCH_SIZE:
+            size, reason = MAX_BATCH_SIZE, 'max'
+        elif size < MIN_BATCH_SIZE:
+            size, reason = MIN_BATCH_SIZE, 'min'
+    new_size = max(int(size), 1)
+    
+    if abs(new_size - controller['size']) >= controller['size'] * 0.1:
+        log_batch_tuning(name, controller, rows, seconds, new_size, reason)
+    controller['size'] = new_size
+
+def write_batch(name, loader, cursor, rows):
+    """Run one batch loader and report its round trip to the table's controller."""
+    if not rows:
+        return
+    start = time.perf_counter()
+    loader(cursor, rows)
+    seconds = time.perf_counter() - start
+    record_latency(name, seconds, len(rows))
+    record_round_trip(name, len(rows), seconds, estimate_row_bytes(rows))
+
+def commit_due(lines_since_commit):
+    """Check whether enough lines were processed since the last commit."""
+    return lines_since_commit >= batch_limit('commit')
+
+def flush_full_batches(cursor, users, tweets, entities):
+    """
+    Write every buffer that reached its batch limit, together with the buffers it
+    depends on: tweets need their users and entities need their tweets. Written
+    buffers are cleared in place; users is the dict built by add_user_snapshot
+    and entities the per-type buffers from new_entity_buffers.
+    """
+    full_entities = {name: rows for name, rows in entities.items() if len(rows) >= batch_limit(name)}
+    full_tweets = bool(full_entities) or len(tweets) >= batch_limit('tweet')
+    full_users = full_tweets or len(users) >= batch_limit('user')
+    
+    if full_users:
+        write_batch('user', load_users_batch, cursor, list(users.values()))
+        users.clear()
+    if full_tweets:
+        write_batch('tweet', load_tweets_batch, cursor, tweets)
+        tweets.clear()
+    if full_entities:
+        write_entities(cursor, full_entities)
+        for rows in full_entities.values():
+            rows.clear()
+
+def log_batch_sizes():
+    """Report the batch sizes the controllers settled on."""
+    if not ADAPTIVE_BATCHES or not batch_controllers:
+        return
+    sizes = ", ".join(f"{name}={controller['size']}" for name, controller in sorted(batch_controllers.items()))
+    message = f"Adaptive batch sizes at the end of the run: {sizes}"
+    print(message)
+    log_summary(message)
+
+def flush_batches(cursor, users, tweets, entities):
+    """
+    Write pending batches in foreign key order: users before the tweets that
+    reference them, and tweets before their entities.
+    """
+    write_batch('user', load_users_batch, cursor, users)
+    write_batch('tweet', load_tweets_batch, cursor, tweets)
+    write_entities(cursor, entities)
+
+def process_file_single_pass(json_file):
+    """
+    Process a single JSON file for users, tweets and entities in one pass.
+
+    Each line is decoded once and contributes to the user, tweet and entity batches. Progress
+    is tracked per file under stage 0 (or the airline stage) instead of per stage.
+    """
+    stage = single_pass_stage()
+    offset, last_processed_line, _ = get_checkpoint(json_file, stage)
+    telemetry_start(json_file, stage, offset, last_processed_line)
+    
+    users_batch = {}
+    tweets_batch = []
+    all_entities = new_entity_buffers()
+    
+    line_number = last_processed_line
+    valid_lines = 0
+    invalid_lines = 0
+    lines_since_commit = 0
+    commit_started = time.perf_counter()
+    
+    with open_data_file(json_file) as (file, raw), open_cold_archive(json_file) as archive:
+        # Jump straight to the last committed position
+        seek_data_stream(file, offset)
+        
+        pbar = tqdm(total=file_fingerprint(json_file)[0],
+                   initial=raw.tell(),
+                   desc=f"[{STAGE_NAMES[stage].upper()}] {json_file}",
+                   unit="B",
+                   unit_scale=True,
+                   position=0)
+        
+        for line_number, line in enumerate(file, start=last_processed_line+1):
+            offset += len(line)
+            lines_since_commit += 1
+            if line_number % BATCH_SIZE == 0:
+                pbar.update(raw.tell() - pbar.n)
+            
+            try:
+                user, tweet, entities = parse_line(line)
+            except DECODE_ERRORS:
+                invalid_lines += 1
+                continue  # Skip invalid JSON lines
+            
+            valid_lines += 1
+            if not keep_line(tweet):
+                archive.write(line)
+                load_stats['lines_archived'] += 1
+                continue
+            
+            if user:
+                add_user_snapshot(users_batch, user)
+            if tweet:
+                tweets_batch.append(tweet)
+                extend_entities(all_entities, entities)
+            
+            # Write full buffers together with the tables they reference,
+            # so a tweet never reaches the database before its user
+            flush_full_batches(cursor, users_batch, tweets_batch, all_entities)
+            
+            # Commit periodically and update progress; only lines whose rows are
+            # flushed may be recorded, so flush before committing
+            if commit_due(lines_since_commit):
+                flush_batches(cursor, list(users_batch.values()), tweets_batch, all_entities)
+                users_batch, tweets_batch, all_entities = {}, [], new_entity_buffers()
+                commit_batches(connection)
+                record_checkpoint(json_file, stage, offset, line_number)
+                telemetry_checkpoint(json_file, stage, offset, line_number)
+                record_round_trip('commit', lines_since_commit, time.perf_counter() - commit_started)
+                lines_since_commit = 0
+                commit_started = time.perf_counter()
+        
+        pbar.update(raw.tell() - pbar.n)
+        pbar.close()
+    
+    # Process any remaining items
+    flush_batches(cursor, list(users_batch.values()), tweets_batch, all_entities)
+    commit_batches(connection)
+    record_checkpoint(json_file, stage, offset, line_number, done=True)
+    telemetry_checkpoint(json_file, stage, offset, line_number, done=True)
+    
+    log_summary(f"Completed all stages for {json_file}: {valid_lines} valid, {invalid_lines} invalid lines")
+    
+    return valid_lines, invalid_lines
+
+# Pipelined single pass: a reader thread cuts the file into chunks of BATCH_SIZE
+# lines, a parser thread turns chunks into row batches and the calling thread
+# writes them. The database driver releases the GIL while SQL Server works, so
+# the next chunk is parsed while a batch is in flight. Bounded queues cap the
+# memory and make a fast stage wait for a slow one.
+PIPELINE_DONE = object()
+
+def pipeline_put(stage_queue, item, stop):
+    """Put an item on a pipeline queue, giving up when the pipeline is stopped."""
+    while not stop.is_set():
+        try:
+            stage_queue.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def pipeline_reader(json_file, offset, last_processed_line, read_queue, stop, pbar):
+    """Read chunks of (offset after chunk, last line number, lines) from a data file."""
+    try:
+        with open_data_file(json_file) as (file, raw):
+            seek_data_stream(file, offset)
+            lines = []
+            line_number = last_processed_line
+            for line_number, line in enumerate(file, start=last_processed_line+1):
+                offset += len(line)
+                lines.append(line)
+                if len(lines) >= BATCH_SIZE:
+                    pbar.update(raw.tell() - pbar.n)
+                    if not pipeline_put(read_queue, (offset, line_number, lines), stop):
+                        return
+                    lines = []
+            pbar.update(raw.tell() - pbar.n)
+            if not pipeline_put(read_queue, (offset, line_number, lines), stop):
+                return
+        pipeline_put(read_queue, PIPELINE_DONE, stop)
+    except Exception as e:
+        pipeline_put(read_queue, e, stop)
+
+def pipeline_parser(json_file, read_queue, parsed_queue, stop):
+    """Parse chunks into (offset, line, valid, invalid, users, tweets, entities) batches."""
+    try:
+        with open_cold_archive(json_file) as archive:
+            while not stop.is_set():
+                try:
+                    chunk = read_queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if chunk is PIPELINE_DONE or isinstance(chunk, Exception):
+                    pipeline_put(parsed_queue, chunk, stop)
+                    return
+                
+                offset, line_number, lines = chunk
+                users_batch = {}
+                tweets_batch = []
+                all_entities = new_entity_buffers()
+                valid_lines = 0
+                invalid_lines = 0
+                for line in lines:
+                    try:
+                        user, tweet, entities = parse_line(line)
+                    except DECODE_ERRORS:
+                        invalid_lines += 1
+                        continue
+                    
+                    valid_lines += 1
+                    if not keep_line(tweet):
+                        archive.write(line)
+                        load_stats['lines_archived'] += 1
+                        continue
+                    
+                    if user:
+                        add_user_snapshot(users_batch, user)
+                    if tweet:
+                        tweets_batch.append(tweet)
+                        extend_entities(all_entities, entities)
+                
+                batch = (offset, line_number, valid_lines, invalid_lines,
+                         list(users_batch.values()), tweets_batch, all_entities)
+                if not pipeline_put(parsed_queue, batch, stop):
+                    return
+    except Exception as e:
+        pipeline_put(parsed_queue, e, stop)
+
+def process_file_pipelined(json_file):
+    """
+    Process a single JSON file like process_file_single_pass, with reading,
+    parsing and writing running concurrently.
+    
+    The queue depths are sampled before every write: a full parsed queue means
+    the database is the bottleneck, an empty one means parsing (or reading) is.
+    """
+    stage = single_pass_stage()
+    offset, last_processed_line, _ = get_checkpoint(json_file, stage)
+    telemetry_start(json_file, stage, offset, last_processed_line)
+    line_number = last_processed_line
+    
+    pbar = tqdm(total=file_fingerprint(json_file)[0],
+               initial=0,
+               desc=f"[{STAGE_NAMES[stage].upper()}] {json_file}",
+               unit="B",
+               unit_scale=True,
+               position=0)
+    
+    read_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    parsed_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=pipeline_reader, daemon=True,
+                         args=(json_file, offset, last_processed_line, read_queue, stop, pbar)),
+        threading.Thread(target=pipeline_parser, daemon=True,
+                         args=(json_file, read_queue, parsed_queue, stop))
+    ]
+    for thread in threads:
+        thread.start()
+    
+    users_batch = {}
+    tweets_batch = []
+    all_entities = new_entity_buffers()
+    
+    valid_lines = 0
+    invalid_lines = 0
+    batches = 0
+    lines_since_commit = 0
+    commit_started = time.perf_counter()
+    depths = Counter()
+    writer_wait = 0.0
+    try:
+        while True:
+            depths['read'] += read_queue.qsize()
+            depths['parsed'] += parsed_queue.qsize()
+            depths['read_max'] = max(depths['read_max'], read_queue.qsize())
+            depths['parsed_max'] = max(depths['parsed_max'], parsed_queue.qsize())
+            
+            wait_start = time.perf_counter()
+            batch = parsed_queue.get()
+            writer_wait += time.perf_counter() - wait_start
+            if batch is PIPELINE_DONE:
+                break
+            if isinstance(batch, Exception):
+                raise batch
+            
+            chunk_offset, chunk_line, valid, invalid, users, tweets, entities = batch
+            lines_since_commit += chunk_line - line_number
+            offset, line_number = chunk_offset, chunk_line
+            valid_lines += valid
+            invalid_lines += invalid
+            batches += 1
+            
+            # Chunks are re-batched per table, so the batch sizes do not depend on the chunk size
+            for user in users:
+                add_user_snapshot(users_batch, user)
+            tweets_batch.extend(tweets)
+            extend_entities(all_entities, entities)
+            flush_full_batches(cursor, users_batch, tweets_batch, all_entities)
+            
+            if commit_due(lines_since_commit):
+                flush_batches(cursor, list(users_batch.values()), tweets_batch, all_entities)
+                users_batch, tweets_batch, all_entities = {}, [], new_entity_buffers()
+                commit_batches(connection)
+                record_checkpoint(json_file, stage, offset, line_number)
+                telemetry_checkpoint(json_file, stage, offset, line_number)
+                record_round_trip('commit', lines_since_commit, time.perf_counter() - commit_started)
+                lines_since_commit = 0
+                commit_started = time.perf_counter()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        pbar.close()
+    
+    flush_batches(cursor, list(users_batch.values()), tweets_batch, all_entities)
+    commit_batches(connection)
+    record_checkpoint(json_file, stage, offset, line_number, done=True)
+    telemetry_checkpoint(json_file, stage, offset, line_number, done=True)
+    
+    samples = max(batches + 1, 1)
+    message = (f"Pipeline queue depths for {json_file}: read avg {depths['read'] / samples:.1f} "
+               f"(max {depths['read_max']}), parsed avg {depths['parsed'] / samples:.1f} "
+               f"(max {depths['parsed_max']}) of {PIPELINE_QUEUE_SIZE}; "
+               f"writer waited {writer_wait:.1f}s for parsed batches")
+    print(message)
+    log_summary(message)
+    log_summary(f"Completed all stages for {json_file}: {valid_lines} valid, {invalid_lines} invalid lines")
+    
+    return valid_lines, invalid_lines
+
+def file_is_complete(json_file):
+    """
+    Check whether the single pass or all three separate stages finished a file.
+    A full load also covers everything the airline mode would load.
+    """
+    if is_stage_complete(json_file, 0) or all(is_stage_complete(json_file, stage) for stage in (1, 2, 3)):
+        return True
+    return relevant_tweet_ids is not None and is_stage_complete(json_file, AIRLINE_STAGE)
+
+def process_all_stages(json_files):
+    """
+    Process users, tweets and entities for all files in a single pass per file.
+    
+    Returns:
+        tuple: (valid_count, invalid_count)
+    """
+    print("\n--- Processing users, tweets and entities in a single pass ---")
+    log_summary("Starting single-pass processing of users, tweets and entities")
+    
+    total_valid = 0
+    total_invalid = 0
+    
+    for json_file in json_files:
+        if file_is_complete(json_file):
+            print(f"Skipping {json_file} - already processed")
+            continue
+        
+        if PIPELINE:
+            valid, invalid = process_file_pipelined(json_file)
+        else:
+            valid, invalid = process_file_single_pass(json_file)
+        total_valid += valid
+        total_invalid += invalid
+    
+    print(f"Completed single pass: {total_valid} valid, {total_invalid} invalid")
+    return total_valid, total_invalid
+
+# Parallel ingestion: parser processes decode and clean lines, writer processes
+# own the database connections. Every batch of a file goes to the same writer,
+# so a file's commits happen in order and its progress stays monotonic.
+def parse_worker(task_queue, writer_queues, settings, relevant_ids=None):
+    """
+    Parse files or chunks from the task queue and send row batches to their writer.
+    Tasks are (checkpoint key, writer index, offset, last line, end offset or None);
+    line numbers of a chunk count from the start of the chunk.
+    """
+    global relevant_tweet_ids
+    apply_loader_settings(settings)
+    relevant_tweet_ids = relevant_ids
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        key, writer_index, offset, last_processed_line, end = task
+        json_file = split_chunk_key(key)[0]
+        writer_queue = writer_queues[writer_index]
+        
+        users_batch = {}
+        tweets_batch = []
+        all_entities = new_entity_buffers()
+        
+        line_number = last_processed_line
+        valid_lines = 0
+        invalid_lines = 0
+        
+        try:
+            with open_line_range(json_file, offset, end) as file, open_cold_archive(key) as archive:
+                for line_number, line in enumerate(file, start=last_processed_line+1):
+                    offset += len(line)
+                    try:
+                        user, tweet, entities = parse_line(line)
+                    except DECODE_ERRORS:
+                        invalid_lines += 1
+                        continue
+                    
+                    valid_lines += 1
+                    if keep_line(tweet):
+                        if user:
+                            add_user_snapshot(users_batch, user)
+                        if tweet:
+                            tweets_batch.append(tweet)
+                            extend_entities(all_entities, entities)
+                    else:
+                        archive.write(line)
+                    
+                    commit = line_number % (BATCH_SIZE * 5) == 0
+                    if (commit or len(users_batch) >= BATCH_SIZE or len(tweets_batch) >= BATCH_SIZE
+                            or any(len(rows) >= BATCH_SIZE for rows in all_entities.values())):
+                        writer_queue.put(('batch', key, (offset, line_number), commit,
+                                          (list(users_batch.values()), tweets_batch, all_entities)))
+                        users_batch, tweets_batch, all_entities = {}, [], new_entity_buffers()
+            
+            writer_queue.put(('done', key, (offset, line_number), (valid_lines, invalid_lines),
+                              (list(users_batch.values()), tweets_batch, all_entities)))
+        except Exception as e:
+            writer_queue.put(('error', key, (offset, line_number), str(e), None))
+
+# Writers share users (airline accounts are in every file) and sometimes tweets.
+# The MERGEs hold their key range locks and every batch is sorted by key, but a
+# writer can still be chosen as deadlock victim (1205) or lose a race on a new
+# key (2627). A deadlock rolls back the whole open transaction, so the writer
+# replays every batch written since its last commit.
+RETRYABLE_ERRORS = ('(1205)', '(2627)')
+
+def is_retryable_error(error):
+    """Check whether a database error is a deadlock or a duplicate key race worth retrying."""
+    return isinstance(error, pyodbc.Error) and any(code in str(error) for code in RETRYABLE_ERRORS)
+
+def rollback_batches(conn):
+    """Roll back written batches and forget the cache entries that describe them."""
+    conn.rollback()
+    pending_user_hashes.clear()
+    pending_bloom_bits().clear()
+
+def flush_with_retry(conn, cursor, uncommitted, batches):
+    """Write batches in the open transaction, replaying it after a deadlock or key race."""
+    for attempt in range(WRITE_RETRIES + 1):
+        try:
+            for earlier in (uncommitted if attempt else []):
+                flush_batches(cursor, *earlier)
+            flush_batches(cursor, *batches)
+            uncommitted.append(batches)
+            return
+        except pyodbc.Error as e:
+            if attempt == WRITE_RETRIES or not is_retryable_error(e):
+                raise
+            rollback_batches(conn)
+            load_stats['write_retries'] += 1
+            log_summary(f"Replaying {len(uncommitted) + 1} batches after: {e}")
+            time.sleep(0.1 * 2 ** attempt)
+
+def db_writer(writer_queue, result_queue, settings):
+    """Write row batches with a dedicated connection and report committed progress."""
+    apply_loader_settings(settings)
+    writer_connection, writer_cursor = open_connection()
+    uncommitted = []
+    try:
+        while True:
+            message = writer_queue.get()
+            if message is None:
+                break
+            kind, json_file, position, info, batches = message
+            
+            if kind == 'error':
+                result_queue.put(('error', json_file, position, info))
+                continue
+            
+            flush_with_retry(writer_connection, writer_cursor, uncommitted, batches)
+            if kind == 'batch' and info:
+                commit_batches(writer_connection)
+                uncommitted.clear()
+                result_queue.put(('progress', json_file, position, None))
+            if kind == 'done':
+                commit_batches(writer_connection)
+                uncommitted.clear()
+                result_queue.put(('done', json_file, position, info))
+        result_queue.put(('stats', None, (0, 0), dict(load_stats)))
+    except Exception as e:
+        writer_connection.rollback()
+        result_queue.put(('error', None, (0, 0), str(e)))
+    finally:
+        writer_cursor.close()
+        writer_connection.close()
+
+def process_all_stages_parallel(json_files, workers, writers=1):
+    """
+    Process users, tweets and entities for all files with parallel parsing.
+    
+    Args:
+        json_files: List of JSON files to process
+        workers: Number of parser processes
+        writers: Number of writer processes, each with its own connection
+    
+    Returns:
+        tuple: (valid_count, invalid_count)
+    """
+    print(f"\n--- Processing users, tweets and entities with {workers} parsers and {writers} writers ---")
+    log_summary(f"Starting parallel processing with {workers} parsers and {writers} writers")
+    
+    pending_files = []
+    for json_file in json_files:
+        if file_is_complete(json_file):
+            print(f"Skipping {json_file} - already processed")
+            continue
+        pending_files.append(json_file)
+    
+    total_valid = 0
+    total_invalid = 0
+    if not pending_files:
+        return total_valid, total_invalid
+    
+    task_queue = multiprocessing.Queue()
+    writer_queues = [multiprocessing.Queue(maxsize=QUEUE_SIZE) for _ in range(writers)]
+    result_queue = multiprocessing.Queue()
+    
+    stage = single_pass_stage()
+    tasks = []
+    file_chunks = {}
+    for json_file in pending_files:
+        offset, last_processed_line, _ = get_checkpoint(json_file, stage)
+        size = file_fingerprint(json_file)[0]
+        # A file that was already partly loaded as a whole continues that way
+        if not json_file.endswith('.json') or size <= CHUNK_BYTES or offset > 0:
+            tasks.append((json_file, offset, last_processed_line, None))
+            continue
+        
+        file_chunks[json_file] = {'remaining': 0, 'lines': 0, 'valid': 0, 'invalid': 0}
+        for start, end in split_file_ranges(json_file):
+            key = chunk_key(json_file, start, end)
+            offset, last_processed_line, done = get_checkpoint(key, stage)
+            if done:
+                file_chunks[json_file]['lines'] += last_processed_line
+                continue
+            file_chunks[json_file]['remaining'] += 1
+            tasks.append((key, offset or start, last_processed_line, end))
+        if file_chunks[json_file]['remaining'] == 0:
+            # Every chunk finished before the file itself was marked complete
+            record_checkpoint(json_file, stage, size, file_chunks[json_file]['lines'], done=True)
+    
+    for index, (key, offset, last_processed_line, end) in enumerate(tasks):
+        telemetry_start(key, stage, offset, last_processed_line)
+        task_queue.put((key, index % writers, offset, last_processed_line, end))
+    for _ in range(workers):
+        task_queue.put(None)
+    if file_chunks:
+        log_summary(f"Split {len(file_chunks)} large files into chunks; {len(tasks)} parallel tasks")
+    
+    settings = get_loader_settings()
+    close_user_cache()
+    parser_processes = [multiprocessing.Process(target=parse_worker,
+                                                args=(task_queue, writer_queues, settings, relevant_tweet_ids))
+                        for _ in range(workers)]
+    writer_processes = [multiprocessing.Process(target=db_writer, args=(writer_queue, result_queue, settings))
+                        for writer_queue in writer_queues]
+    for process in parser_processes + writer_processes:
+        process.start()
+    
+    remaining = len(tasks)
+    pbar = tqdm(total=remaining, desc="[ALL] files and chunks", unit="tasks", position=0)
+    try:
+        while remaining:
+            kind, key, (offset, line_number), info = result_queue.get()
+            if kind == 'progress':
+                record_checkpoint(key, stage, offset, line_number)
+                telemetry_checkpoint(key, stage, offset, line_number)
+            elif kind == 'done':
+                record_checkpoint(key, stage, offset, line_number, done=True)
+                telemetry_checkpoint(key, stage, offset, line_number, done=True)
+                valid, invalid = info
+                total_valid += valid
+                total_invalid += invalid
+                remaining -= 1
+                pbar.update(1)
+                
+                json_file, byte_range = split_chunk_key(key)
+                if byte_range is None:
+                    log_summary(f"Completed all stages for {json_file}: {valid} valid, {invalid} invalid lines")
+                    continue
+                # A chunked file is complete once its last chunk is
+                chunks = file_chunks[json_file]
+                chunks['remaining'] -= 1
+                chunks['lines'] += line_number
+                chunks['valid'] += valid
+                chunks['invalid'] += invalid
+                if chunks['remaining'] == 0:
+                    record_checkpoint(json_file, stage, file_fingerprint(json_file)[0], chunks['lines'], done=True)
+                    log_summary(f"Completed all stages for {json_file} in chunks: "
+                                f"{chunks['valid']} valid, {chunks['invalid']} invalid lines")
+            else:
+                raise RuntimeError(f"Parallel loading failed for {key or 'a writer'}: {info}")
+    except BaseException as e:
+        for process in parser_processes + writer_processes:
+            process.terminate()
+        log_summary(f"Parallel processing stopped: {e}")
+        raise
+    finally:
+        pbar.close()
+    
+    for process in parser_processes:
+        process.join()
+    for writer_queue in writer_queues:
+        writer_queue.put(None)
+    # Every writer reports its counters when it stops
+    for _ in writer_processes:
+        kind, _, _, info = result_queue.get()
+        if kind == 'stats':
+            load_stats.update(info)
+    for process in writer_processes:
+        process.join()
+    
+    print(f"Completed parallel pass: {total_valid} valid, {total_invalid} invalid")
+    return total_valid, total_invalid
+
+def ingest_new_files(workers=0, writers=1, settle_seconds=0, defer_indexes=False, defer_foreign_keys=False):
+    """
+    Incremental run: load only the data files that are new or changed according
+    to the ingest manifest, and add them to the manifest once they are complete.
+    With defer_indexes the indexes are disabled for the load of the new files
+    and rebuilt right after it.
+    
+    Returns:
+        tuple: (file_count, valid_count, invalid_count)
+    """
+    manifest = load_manifest()
+    json_files = [file for file in os.listdir(data_directory) if is_data_file(file)]
+    new_files = find_new_files(json_files, manifest, settle_seconds)
+    if not new_files:
+        save_manifest(manifest)
+        return 0, 0, 0
+    
+    # In airline mode the relevant tweets of the new files are added, so they are not archived
+    if relevant_tweet_ids is not None:
+        extend_relevant_tweet_ids(json_files, new_files)
+    
+    print(f"\n--- Incremental run: {len(new_files)} new or changed of {len(json_files)} files ---")
+    log_summary(f"Incremental run: {len(new_files)} new or changed files: {', '.join(new_files)}")
+    
+    if defer_indexes:
+        disable_indexes(foreign_keys=defer_foreign_keys)
+    try:
+        # Changed files start over, because their checkpoints no longer match the file on disk
+        if workers > 0:
+            total_valid, total_invalid = process_all_stages_parallel(new_files, workers, writers)
+        else:
+            total_valid, total_invalid = process_all_stages(new_files)
+    finally:
+        if defer_indexes:
+            connection.rollback()
+            rebuild_indexes()
+    
+    for json_file in new_files:
+        if file_is_complete(json_file):
+            manifest[json_file] = manifest_entry(json_file)
+    save_manifest(manifest)
+    return len(new_files), total_valid, total_invalid
+
 def process_stage(stage_number, json_files, description=None):
     """
     Process all files for a specific stage.
@@ -566,7 +3656,7 @@ def process_stage(stage_number, json_files, description=None):
     Returns:
         tuple: (valid_count, invalid_count)
     """
-    stage_name = {1: "users", 2: "tweets", 3: "entities"}[stage_number]
+    stage_name = STAGE_NAMES[stage_number]
     description = description or f"Processing {stage_name}"
     
     print(f"\n--- STEP {stage_number}: {description} ---")
@@ -575,71 +3665,302 @@ def process_stage(stage_number, json_files, description=None):
     total_valid = 0
     total_invalid = 0
     
-    for json_file in json_files:
-        # Check if this file has already been completed for this stage
-        if progress[json_file][stage_number] > 0:
-            json_path = os.path.join(data_directory, json_file)
-            with open(json_path, 'r', encoding='utf8') as file:
-                file_lines = sum(1 for _ in file)
-            
-            if progress[json_file][stage_number] >= file_lines:
+    # Tweets and entities can be written by several connections at once
+    shards = None
+    if WRITER_SHARDS > 1 and stage_number in (2, 3):
+        shards = start_writer_shards(WRITER_SHARDS)
+        log_summary(f"Writing {stage_name} with {WRITER_SHARDS} sharded connections")
+    
+    try:
+        for json_file in json_files:
+            # Check if this file has already been completed for this stage
+            if is_stage_complete(json_file, stage_number):
                 print(f"Skipping {stage_name} for {json_file} - already processed")
                 continue
-                
-        valid, invalid = process_file(json_file, stage=stage_number)
-        total_valid += valid
-        total_invalid += invalid
+                    
+            valid, invalid = process_file(json_file, stage=stage_number, shards=shards)
+            total_valid += valid
+            total_invalid += invalid
+    except BaseException:
+        if shards:
+            stop_writer_shards(shards, wait=False)
+        raise
+    if shards:
+        stop_writer_shards(shards)
     
     print(f"Completed {stage_name} stage: {total_valid} valid, {total_invalid} invalid")
     return total_valid, total_invalid
 
+def benchmark_parsing(json_files, backends):
+    """
+    Run the decode and clean steps over the data directory without touching
+    the database and report throughput for every decoder backend.
+    
+    Returns:
+        dict: backend name -> (lines per second, MB per second)
+    """
+    print("\n--- Parse-only benchmark ---")
+    log_summary(f"Starting parse-only benchmark for backends: {', '.join(backends)}")
+    
+    results = {}
+    
+    for backend in backends:
+        backend = select_decoder(backend)
+        lines = 0
+        invalid_lines = 0
+        total_bytes = 0
+        start = time.perf_counter()
+        
+        for json_file in json_files:
+            with open_data_file(json_file) as (file, _):
+                for line in tqdm(file, desc=f"[{backend.upper()}] {json_file}", unit="lines", position=0):
+                    lines += 1
+                    total_bytes += len(line)
+                    try:
+                        parse_line(line)
+                    except DECODE_ERRORS:
+                        invalid_lines += 1
+        
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        results[backend] = (lines / elapsed, total_bytes / 1024 / 1024 / elapsed)
+        message = (f"Parse-only {backend}: {lines} lines ({invalid_lines} invalid) in {elapsed:.1f}s, "
+                   f"{results[backend][0]:,.0f} lines/s, {results[backend][1]:,.1f} MB/s")
+        print(message)
+        log_summary(message)
+    
+    return results
+
+def log_load_stats():
+    """Report the loader counters of this run in the summary log."""
+    if load_stats['lines_archived']:
+        message = f"Airline filter: {load_stats['lines_archived']} lines moved to the cold archive"
+        print(message)
+        log_summary(message)
+    if load_stats['users_checked']:
+        message = (f"User cache: {load_stats['users_unchanged']} of {load_stats['users_checked']} "
+                   f"user rows unchanged and skipped")
+        print(message)
+        log_summary(message)
+    if load_stats['tweets_checked']:
+        message = (f"Tweet filter: {load_stats['tweets_bloom_hits']} Bloom hits, "
+                   f"{load_stats['tweets_skipped']} of {load_stats['tweets_checked']} tweet rows already loaded and skipped "
+                   f"({load_stats['tweets_skipped'] / load_stats['tweets_checked']:.1%} hit rate)")
+        print(message)
+        log_summary(message)
+    written = [f"{table} {load_stats[f'inserted:{table}']} inserted, {load_stats[f'updated:{table}']} updated"
+               for table in ('user', 'tweet', *ENTITY_EXTRACTORS)
+               if load_stats[f"inserted:{table}"] or load_stats[f"updated:{table}"]]
+    if written:
+        message = f"Rows written: {'; '.join(written)}"
+        print(message)
+        log_summary(message)
+    if load_stats['write_retries']:
+        message = f"Parallel writers: {load_stats['write_retries']} transactions replayed after a deadlock or key race"
+        print(message)
+        log_summary(message)
+
 # Main execution
 if __name__ == "__main__":
-    # Get a list of all JSON files in the directory
+    parser = argparse.ArgumentParser(description="Load tweet JSON files into the airline_tweets database.")
+    parser.add_argument('--single-pass', action='store_true',
+                        help="decode every line once and load users, tweets and entities together")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="number of parser processes for parallel single-pass loading")
+    parser.add_argument('--writers', type=int, default=1,
+                        help="number of database writer processes used with --workers")
+    parser.add_argument('--bulk-merge', action='store_true',
+                        help="load users and tweets through staging tables with one MERGE per batch")
+    parser.add_argument('--decoder', choices=['auto', 'json', 'orjson', 'simdjson'], default=None,
+                        help="JSON decoder backend (default: fastest installed)")
+    parser.add_argument('--parse-only', action='store_true',
+                        help="only decode and clean the data to benchmark parsing, without using the database")
+    parser.add_argument('--no-user-cache', action='store_true',
+                        help="always merge every user instead of skipping unchanged rows")
+    parser.add_argument('--reset-user-cache', action='store_true',
+                        help="forget which user rows were already written")
+    parser.add_argument('--no-tweet-filter', action='store_true',
+                        help="always merge every tweet instead of skipping rows that are already loaded")
+    parser.add_argument('--reset-tweet-filter', action='store_true',
+                        help="forget which tweet rows were already written")
+    parser.add_argument('--airline-only', action='store_true',
+                        help="single pass that loads only airline-relevant tweets and archives the rest")
+    parser.add_argument('--to-parquet', action='store_true',
+                        help="convert the data files to the day-partitioned Parquet store, without using the database")
+    parser.add_argument('--from-parquet', action='store_true',
+                        help="load the Parquet store instead of the JSON files")
+    parser.add_argument('--since', help="first day to load with --from-parquet (YYYY-MM-DD)")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="single pass with reading, parsing and database writes overlapped in threads")
+    parser.add_argument('--adaptive-batches', action='store_true',
+                        help="size batches and commits per table from measured round-trip latency")
+    parser.add_argument('--writer-shards', type=int, default=1, metavar='K',
+                        help="write the tweet and entity stages with K connections, sharded by tweet id")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only load files that are new or changed since the last run, using the ingest manifest")
+    parser.add_argument('--watch', type=int, metavar='SECONDS', default=0,
+                        help="keep running and load new files every SECONDS (implies --incremental)")
+    parser.add_argument('--defer-indexes', action='store_true',
+                        help="disable the nonclustered indexes while loading and rebuild them afterwards "
+                             "(with --watch: around every ingest cycle)")
+    parser.add_argument('--defer-foreign-keys', action='store_true',
+                        help="with --defer-indexes, also stop checking foreign keys until the load is done")
+    parser.add_argument('--tweet-text', choices=['split', 'compressed'], default=None,
+                        help="move tweet text out of dbo.tweet into dbo.tweet_text, optionally compressed")
+    parser.add_argument('--partition-tweets', action='store_true',
+                        help="add a columnstore on the analytic tweet columns, partitioned by month of created_at")
+    parser.add_argument('--maintain-partitions', action='store_true',
+                        help="add partitions for new months and compact the tweet columnstore, then exit")
+    parser.add_argument('--until', help="last day to load with --from-parquet (YYYY-MM-DD)")
+    parser.add_argument('--data-dir', metavar='DIRECTORY',
+                        help="read the data files from DIRECTORY instead of data/")
+    parser.add_argument('--dedupe-entities', action='store_true',
+                        help="remove duplicate hashtag, mention, poll, URL and media rows, add their unique keys, then exit")
+    args = parser.parse_args()
+    if args.data_dir:
+        data_directory = os.path.abspath(args.data_dir)
+    BULK_MERGE = args.bulk_merge
+    PIPELINE = args.pipeline
+    ADAPTIVE_BATCHES = args.adaptive_batches
+    WRITER_SHARDS = max(1, args.writer_shards)
+    USER_CACHE = not args.no_user_cache
+    TWEET_FILTER = not args.no_tweet_filter
+    DECODER = select_decoder(args.decoder or 'auto')
+    
+    # Get a list of all JSON files in the directory, compressed or not
     files = os.listdir(data_directory)
-    json_files = [file for file in files if file.endswith('.json')]
+    json_files = [file for file in files if is_data_file(file)]
     
-    if not json_files:
+    if (not json_files and not args.from_parquet and not args.watch and not args.maintain_partitions
+            and not args.dedupe_entities):
         print("No JSON files found in the directory.")
         sys.exit(1)
         
     total_files = len(json_files)
     print(f"Found {total_files} JSON files to process.")
+    
+    if args.to_parquet:
+        convert_all_to_parquet(json_files)
+        sys.exit(0)
+    
+    if args.parse_only:
+        # Benchmark every installed backend unless one was chosen explicitly
+        benchmark_parsing(json_files, [args.decoder] if args.decoder else list(JSON_DECODERS))
+        sys.exit(0)
+    
     log_summary(f"Starting processing of {total_files} JSON files")
     
+    # Convert an old line-number progress log, then drop superseded journal records
+    migrate_legacy_progress()
+    compact_checkpoint_journal()
+    
+    connection, cursor = open_connection()
+    if USER_CACHE or TWEET_FILTER:
+        database_identity = get_database_identity(cursor)
+        if USER_CACHE:
+            validate_user_cache(database_identity, reset=args.reset_user_cache)
+        if TWEET_FILTER:
+            validate_tweet_bloom(database_identity, reset=args.reset_tweet_filter)
+    
     # Set up database tables
     print("\n--- Setting up database structure ---")
     if not setup_database_tables():
         print("Failed to set up database tables. Exiting.")
         sys.exit(1)
     
+    if not setup_tweet_text(args.tweet_text):
+        print("Failed to set up the tweet text layout. Exiting.")
+        sys.exit(1)
+    
     # Create database indexes
     if not create_indexes():
         print("Warning: Failed to create some indexes. Processing will continue but might be slower.")
     
-    # Process each stage sequentially for all files
-    total_valid_users, total_invalid_users = process_stage(1, json_files, "Processing Users")
+    # Never load on top of indexes an earlier run failed to rebuild
+    if not restore_interrupted_indexes():
+        print("Failed to rebuild indexes left disabled by an earlier run. Exiting.")
+        sys.exit(1)
+    
+    if args.partition_tweets and not partition_tweets():
+        print("Failed to partition the tweet table. Exiting.")
+        sys.exit(1)
+    
+    if args.maintain_partitions:
+        sys.exit(0 if maintain_tweet_partitions() else 1)
     
-    total_valid_tweets, total_invalid_tweets = process_stage(2, json_files, "Processing Tweets")
+    if args.dedupe_entities:
+        sys.exit(0 if dedupe_entities() else 1)
     
-    total_valid_entities, total_invalid_entities = process_stage(3, json_files, "Processing Entities")
+    # Watch mode defers the indexes per ingest cycle, so they are not disabled while it waits
+    if args.defer_indexes and not args.watch:
+        disable_indexes(foreign_keys=args.defer_foreign_keys)
     
-    # Final summary
-    total_valid = total_valid_users + total_valid_tweets + total_valid_entities
-    total_invalid = total_invalid_users + total_invalid_tweets + total_invalid_entities
+    if args.airline_only:
+        relevant_tweet_ids = load_relevant_tweet_ids(json_files)
     
-    print("\n=== Processing Summary ===")
-    print(f"Users processed: {total_valid_users} valid, {total_invalid_users} invalid")
-    print(f"Tweets processed: {total_valid_tweets} valid, {total_invalid_tweets} invalid")
-    print(f"Entities processed: {total_valid_entities} valid, {total_invalid_entities} invalid")
-    print(f"Total: {total_valid} valid, {total_invalid} invalid lines")
+    try:
+        if args.incremental or args.watch:
+            while True:
+                file_count, total_valid, total_invalid = ingest_new_files(
+                    args.workers, max(1, args.writers), WATCH_SETTLE_SECONDS if args.watch else 0,
+                    defer_indexes=args.defer_indexes and bool(args.watch), defer_foreign_keys=args.defer_foreign_keys)
+                if file_count:
+                    print(f"Incremental run: {file_count} files, {total_valid} valid, {total_invalid} invalid lines")
+                    log_summary(f"Incremental run: {file_count} files, {total_valid} valid, {total_invalid} invalid lines")
+                if not args.watch:
+                    break
+                time.sleep(args.watch)
+        elif args.from_parquet:
+            total_valid, total_invalid = load_from_parquet(args.since, args.until)
+        
+            print("\n=== Processing Summary ===")
+            print(f"Parquet store: {total_valid} rows loaded")
+        
+            log_summary("=== Processing Complete ===")
+            log_summary(f"Parquet store: {total_valid} rows loaded")
+        elif args.single_pass or args.workers > 0 or args.airline_only or args.pipeline:
+            if args.workers > 0:
+                total_valid, total_invalid = process_all_stages_parallel(json_files, args.workers, max(1, args.writers))
+            else:
+                total_valid, total_invalid = process_all_stages(json_files)
+        
+            print("\n=== Processing Summary ===")
+            print(f"Single pass: {total_valid} valid, {total_invalid} invalid lines")
+        
+            log_summary("=== Processing Complete ===")
+            log_summary(f"Single pass: {total_valid} valid, {total_invalid} invalid lines")
+        else:
+            # Process each stage sequentially for all files
+            total_valid_users, total_invalid_users = process_stage(1, json_files, "Processing Users")
+        
+            total_valid_tweets, total_invalid_tweets = process_stage(2, json_files, "Processing Tweets")
+        
+            total_valid_entities, total_invalid_entities = process_stage(3, json_files, "Processing Entities")
+        
+            # Final summary
+            total_valid = total_valid_users + total_valid_tweets + total_valid_entities
+            total_invalid = total_invalid_users + total_invalid_tweets + total_invalid_entities
+        
+            print("\n=== Processing Summary ===")
+            print(f"Users processed: {total_valid_users} valid, {total_invalid_users} invalid")
+            print(f"Tweets processed: {total_valid_tweets} valid, {total_invalid_tweets} invalid")
+            print(f"Entities processed: {total_valid_entities} valid, {total_invalid_entities} invalid")
+            print(f"Total: {total_valid} valid, {total_invalid} invalid lines")
+        
+            # Log final summary
+            log_summary("=== Processing Complete ===")
+            log_summary(f"Users processed: {total_valid_users} valid, {total_invalid_users} invalid")
+            log_summary(f"Tweets processed: {total_valid_tweets} valid, {total_invalid_tweets} invalid")
+            log_summary(f"Entities processed: {total_valid_entities} valid, {total_invalid_entities} invalid")
+            log_summary(f"Total: {total_valid} valid, {total_invalid} invalid lines")
+    finally:
+        # Also runs when the load fails, so the database keeps its indexes
+        if args.defer_indexes:
+            connection.rollback()
+            rebuild_indexes()
     
-    # Log final summary
-    log_summary("=== Processing Complete ===")
-    log_summary(f"Users processed: {total_valid_users} valid, {total_invalid_users} invalid")
-    log_summary(f"Tweets processed: {total_valid_tweets} valid, {total_invalid_tweets} invalid")
-    log_summary(f"Entities processed: {total_valid_entities} valid, {total_invalid_entities} invalid")
-    log_summary(f"Total: {total_valid} valid, {total_invalid} invalid lines")
+    log_load_stats()
+    log_batch_sizes()
+    log_telemetry_summary()
     
     # Close the connection
     cursor.close()
@@ -81,21 +81,20 @@ def get_tweet_size(conn):
 
 def get_airline_mentions(conn, airline_id):
     cursor = conn.cursor()
+    # Seeks idx_mention_user_tweet on the mentioned user id, so screen name casing does not matter
     query = """
         SELECT COUNT(*)
         FROM mention m
         join tweet t on m.tweet_id = t.id
-        WHERE name = 'AmericanAir'
+        WHERE m.mentioned_user_id = ?
     """
     
-    params = []
+    params = [airline_id]
     if start_date and end_date:
         query += " AND created_at BETWEEN ? AND ?"
-        params = [start_date, end_date]
-        cursor.execute(query, params)
-        return cursor.fetchone()[0] or 0
+        params += [start_date, end_date]
     
-    cursor.execute(query)  
+    cursor.execute(query, params)
     return cursor.fetchone()[0] or 0
 
 def get_conversation_count_by_airline(conn, airline_id):
@@ -157,7 +156,7 @@ def get_relevant_tweets(conn, airline_id):
     cursor = conn.cursor()
     cursor.execute("""
         SELECT *
-        FROM tweet
+        FROM tweet_full
         WHERE user_id = ? OR in_reply_to_user = ?
         ORDER BY created_at
     """, (airline_id, airline_id))
@@ -173,7 +172,7 @@ def get_conversation_text_by_id(conn, conversation_id):
             u.screen_name,
             t.text
         FROM conversation_tweet ct
-        JOIN tweet t ON ct.tweet_id = t.id
+        JOIN tweet_full t ON ct.tweet_id = t.id
         JOIN [user] u ON t.user_id = u.id
         WHERE ct.conversation_id = ?
         ORDER BY t.created_at
@@ -506,3 +505,13 @@ def insert_conversation_tweets(conn, conversation_id, tweet_ids):
             VALUES (?, ?)
         """, (conversation_id, tid))
     conn.commit()
+
+def truncate_tables(tables):
+    """Empty the given tables, in order. Uses DELETE because SQL Server refuses
+    TRUNCATE on tables that are referenced by a foreign key (conversation)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    for table in tables:
+        cursor.execute(f"DELETE FROM [{table}]")
+    conn.commit()
+    conn.close()
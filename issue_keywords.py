@@ -0,0 +1,98 @@
+import re
+
+# emoji is only needed to spell out emoji as words in the normalized text
+try:
+    import emoji
+except ImportError:
+    emoji = None
+
+# Issue categories and their keywords, matched as substrings of the normalized
+# tweet text. The loader stores the matches of every tweet as a bitmask in
+# tweet.issue_mask, where bit i stands for ISSUE_TYPES[i]: new categories must
+# be appended at the end, or the masks that are already stored change meaning.
+ISSUE_KEYWORDS = {
+    'delay': ['delay', 'delayed', 'late', 'cancelled', 'cancellation', 'rescheduled', 'no show', 'missed connection', 'standby', 'overbooked', 'missed flight', 'missed flights'],
+    'luggage': ['lost luggage', 'lost baggage', 'damaged luggage', 'broken suitcase', 'missing bag', 'baggage fee', 'overweight bag', 'delayed baggage', 'baggage claim', 'luggage handling'],
+    'customer_service': ['rude staff', 'unhelpful', 'no response', 'ignored', 'bad service', 'disrespectful', 'poor communication', 'agent', 'support', 'customer care', 'complaint handling', 'worst customer service', 'attitude', 'retraining', 'role change'],
+    'booking': ['booking error', 'ticket problem', 'reservation', 'seat assignment', 'check-in', 'boarding pass', 'upgrade denied', 'cancel my booking', 'refund', 'confirmation'],
+    'pricing': ['extra charges', 'hidden fees', 'ticket price', 'refund', 'cancellation fee', 'change fee', 'baggage fee', 'overcharge', 'expensive', 'no compensation'],
+    'flight_experience': [
+        'seat comfort', 'legroom', 'dirty', 'smelly', 'broken seat', 'temperature', 'noisy', 'air conditioning',
+        'food quality', 'inflight meal', 'entertainment system', 'underseat storage', 'personal item', 'small storage',
+        'crowded', 'uncomfortable', 'flight experience', 'inflight', 'entertainment', 'meal', 'food', 'drink', 'wifi'
+    ],
+    'safety': ['safety', 'emergency', 'security check', 'scary', 'dangerous', 'turbulence', 'emergency landing', 'staff negligence', 'unprofessional'],
+    'communication': ['no updates', 'lack of information', 'missed announcements', 'confusing', 'wrong info', 'not informed', 'app failure', 'website down', 'lost boarding pass'],
+    'accessibility': ['wheelchair', 'special assistance', 'disability', 'elderly', 'medical help', 'service animal', 'no help', 'unaccommodating'],
+    'refunds': ['refund delayed', 'no refund', 'compensation', 'voucher', 'claim denied', 'delay compensation', 'poor handling']
+}
+ISSUE_TYPES = list(ISSUE_KEYWORDS)
+
+# One alternation per category; a search is the same as testing every keyword with `in`
+ISSUE_PATTERNS = [re.compile('|'.join(re.escape(keyword) for keyword in ISSUE_KEYWORDS[issue])) for issue in ISSUE_TYPES]
+URL_PATTERN = re.compile(r'http\S+')
+DM_PATTERN = re.compile(r'\b(dm|dms|direct message[s]?)\b')
+# demojize spells emoji as :name: tokens, which are not words of the tweet and
+# must not match keywords (":chocolate_bar:" contains "late")
+EMOJI_NAME_PATTERN = re.compile(r':[^\s:]+:')
+
+def normalize_text(text):
+    """Lowercase a tweet text, strip URLs, spell out emoji and collapse whitespace."""
+    if not text:
+        return None
+    text = URL_PATTERN.sub('', text.lower())
+    if emoji is not None:
+        text = emoji.demojize(text)
+    return ' '.join(text.split())
+
+def keyword_text(normalized):
+    """Normalized text without spelled-out emoji, as matched against keywords."""
+    return EMOJI_NAME_PATTERN.sub(' ', normalized) if normalized else normalized
+
+def issue_mask(normalized):
+    """Bitmask of the issue categories whose keywords occur in a normalized text."""
+    mask = 0
+    normalized = keyword_text(normalized)
+    if normalized:
+        for bit, pattern in enumerate(ISSUE_PATTERNS):
+            if pattern.search(normalized):
+                mask |= 1 << bit
+    return mask
+
+def issue_types(mask):
+    """Issue categories set in a bitmask, in ISSUE_TYPES order."""
+    return [issue for bit, issue in enumerate(ISSUE_TYPES) if mask & (1 << bit)]
+
+def find_dm_mention(normalized, context=30):
+    """
+    Find a request to move to direct messages in a normalized text.
+
+    Args:
+        normalized: Text as returned by normalize_text
+        context: Characters kept on either side of the match
+
+    Returns:
+        str: The match with its surrounding text, or None when there is no request
+    """
+    text = keyword_text(normalized)
+    match = DM_PATTERN.search(text) if text else None
+    if match is None:
+        return None
+    # Slice the text the pattern ran on; spelled-out emoji shift the offsets
+    snippet = text[max(0, match.start() - context):match.end() + context]
+    return ' '.join(snippet.split())
+
+def has_dm_mention(normalized):
+    """Whether a normalized text asks to continue in direct messages."""
+    text = keyword_text(normalized)
+    return bool(text) and DM_PATTERN.search(text) is not None
+
+def text_features(text):
+    """
+    Compute the stored text features of a tweet.
+
+    Returns:
+        tuple: (norm_text, issue_mask, dm_mention)
+    """
+    normalized = normalize_text(text)
+    return normalized, issue_mask(normalized), has_dm_mention(normalized)
@@ -1,3 +1,4 @@
+import os
 import matplotlib.pyplot as plt
 from db_repository import (
     get_connection,get_airline_id,
@@ -8,12 +9,22 @@ from db_repository import (
     get_tweet_volume_over_time
 )
 from demo_util import save_plot
+from tweet_store import pa, store_directory, count_unique_tweets, count_mentions
 
 conn = get_connection()
 
-def plot_effect_on_data():
+def get_json_counts():
     # Your provided values
     json_data = [6094135, 36.048, 849013, 94750]
+
+    # Recount tweets and mentions from the Parquet store when it has been built
+    if pa is not None and os.path.isdir(store_directory):
+        json_data[0] = count_unique_tweets()
+        json_data[2] = count_mentions(get_airline_id(conn, 'AmericanAir'))
+    return json_data
+
+def plot_effect_on_data():
+    json_data = get_json_counts()
     labels = [
         "Unique tweets",
         "Data Size (GB)",
@@ -10,8 +10,8 @@ import torch
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import emoji
 from datetime import datetime
-import re
 from db_repository import get_connection
+from issue_keywords import normalize_text, issue_mask, issue_types, find_dm_mention
 import pyodbc
 from tqdm import tqdm
 import logging
@@ -42,25 +42,6 @@ multilingual_model.eval()
 # Label mapping for sentiment scores
 label_mapping = {'NEG': -1, 'NEU': 0, 'POS': 1}
 
-ISSUE_KEYWORDS = {
-    'delay': ['delay', 'delayed', 'late', 'cancelled', 'cancellation', 'rescheduled', 'no show', 'missed connection', 'standby', 'overbooked', 'missed flight', 'missed flights'],
-    'luggage': ['lost luggage', 'lost baggage', 'damaged luggage', 'broken suitcase', 'missing bag', 'baggage fee', 'overweight bag', 'delayed baggage', 'baggage claim', 'luggage handling'],
-    'customer_service': ['rude staff', 'unhelpful', 'no response', 'ignored', 'bad service', 'disrespectful', 'poor communication', 'agent', 'support', 'customer care', 'complaint handling', 'worst customer service', 'attitude', 'retraining', 'role change'],
-    'booking': ['booking error', 'ticket problem', 'reservation', 'seat assignment', 'check-in', 'boarding pass', 'upgrade denied', 'cancel my booking', 'refund', 'confirmation'],
-    'pricing': ['extra charges', 'hidden fees', 'ticket price', 'refund', 'cancellation fee', 'change fee', 'baggage fee', 'overcharge', 'expensive', 'no compensation'],
-    'flight_experience': [
-        'seat comfort', 'legroom', 'dirty', 'smelly', 'broken seat', 'temperature', 'noisy', 'air conditioning', 
-        'food quality', 'inflight meal', 'entertainment system', 'underseat storage', 'personal item', 'small storage',
-        'crowded', 'uncomfortable', 'flight experience', 'inflight', 'entertainment', 'meal', 'food', 'drink', 'wifi'
-    ],
-    'safety': ['safety', 'emergency', 'security check', 'scary', 'dangerous', 'turbulence', 'emergency landing', 'staff negligence', 'unprofessional'],
-    'communication': ['no updates', 'lack of information', 'missed announcements', 'confusing', 'wrong info', 'not informed', 'app failure', 'website down', 'lost boarding pass'],
-    'accessibility': ['wheelchair', 'special assistance', 'disability', 'elderly', 'medical help', 'service animal', 'no help', 'unaccommodating'],
-    'refunds': ['refund delayed', 'no refund', 'compensation', 'voucher', 'claim denied', 'delay compensation', 'poor handling']
-}
-
-
-
 def create_analysis_tables(conn):
     """Create tables for sentiment analysis with proper relationships"""
     try:
@@ -328,14 +309,13 @@ def analyze_sentiment(tweets):
     
     return results
 
-def classify_issues(text):
-    """Classify issues in a text using keyword matching"""
-    text = text.lower()
-    detected = set()
-    for issue, keywords in ISSUE_KEYWORDS.items():
-        if any(k in text for k in keywords):
-            detected.add(issue)
-    return list(detected)
+def classify_issues(tweet):
+    """Classify issues in a tweet from the issue bitmask stored at ingest time"""
+    mask = tweet[7]
+    if mask is None:
+        # Loaded before the text features existed: match the keywords now
+        mask = issue_mask(normalize_text(tweet[2]))
+    return issue_types(mask)
 
 def process_conversations(conn):
     """Process conversations and populate tables"""
@@ -353,10 +333,13 @@ def process_conversations(conn):
                     t.created_at,
                     CAST(CASE WHEN t.user_id = c.airline_id THEN 1 ELSE 0 END as BIT) as is_airline,
                     COALESCE(t.language, 'en') as language,
-                    ROW_NUMBER() OVER (PARTITION BY c.id ORDER BY t.created_at) as position
+                    ROW_NUMBER() OVER (PARTITION BY c.id ORDER BY t.created_at) as position,
+                    t.issue_mask,
+                    t.dm_mention,
+                    t.norm_text
                 FROM conversation c
                 INNER JOIN conversation_tweet ct ON c.id = ct.conversation_id
-                INNER JOIN tweet t ON ct.tweet_id = t.id
+                INNER JOIN tweet_full t ON ct.tweet_id = t.id
                 LEFT JOIN tweet_sentiment ts ON t.id = ts.tweet_id AND c.id = ts.conversation_id
                 WHERE ts.tweet_id IS NULL
             )
@@ -486,7 +469,7 @@ def process_conversations(conn):
                 # Process and store issues
                 detected_issues = {}  # Track issues and their first occurrence
                 for pos, (tweet, sentiment) in enumerate(zip(tweets, sentiments), 1):
-                    issues = classify_issues(tweet[2])
+                    issues = classify_issues(tweet)
                     for issue_type in issues:
                         # Only store first occurrence of each issue type
                         if issue_type not in detected_issues:
@@ -560,17 +543,16 @@ def detect_dm_resolution(tweets):
     for tweet in tweets:
         if not tweet[4]:  # Skip non-airline tweets
             continue
+        if tweet[8] is False:  # The DM flag stored at ingest time rules the tweet out
+            continue
             
-        text = tweet[2].lower()  # Get tweet text and convert to lowercase
-        text = re.sub(r'http\S+', '', text)  # Remove URLs to prevent false positives
+        # Lowercased text without URLs, so links do not give false positives
+        text = tweet[9] if tweet[9] is not None else normalize_text(tweet[2]) or ""
         
         # Simple pattern matching for dm/dms with word boundaries
-        basic_dm = re.search(r'\b(dm|dms|direct message[s]?)\b', text)
-        if basic_dm:
-            # Get some context around the match
-            start = max(0, basic_dm.start() - 30)
-            end = min(len(text), basic_dm.end() + 30)
-            return True, text[start:end].strip()
+        evidence = find_dm_mention(text)
+        if evidence is not None:
+            return True, evidence
                     
     return False, ""
 
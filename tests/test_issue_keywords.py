@@ -0,0 +1,34 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from issue_keywords import text_features, issue_mask, has_dm_mention, issue_types, find_dm_mention
+
+
+def test_emoji_only_tweets_have_no_issues():
+    # chocolate bar, safety vest and tropical drink
+    for text in ["🍫", "🦺", "🍹", "🍫 🦺 🍹"]:
+        _, mask, dm_mention = text_features(text)
+        assert mask == 0
+        assert dm_mention is False
+
+
+def test_spelled_out_emoji_do_not_match_keywords():
+    # What normalize_text stores when the emoji package is installed
+    normalized = ":chocolate_bar: :safety_vest: :tropical_drink: :dm_button:"
+    assert issue_mask(normalized) == 0
+    assert not has_dm_mention(normalized)
+
+
+def test_keywords_next_to_emoji_still_match():
+    normalized = "flight delayed again:chocolate_bar: please dm us"
+    assert issue_types(issue_mask(normalized)) == ['delay']
+    assert has_dm_mention(normalized)
+
+
+def test_dm_evidence_after_emoji_is_the_matched_text():
+    normalized = ":face_with_steam_from_nose: :airplane: :pouting_face: sorry about that, please dm us your booking"
+    evidence = find_dm_mention(normalized, context=10)
+    assert evidence == "t, please dm us your b"
+    assert find_dm_mention(":airplane: no message here") is None
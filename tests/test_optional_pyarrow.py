@@ -0,0 +1,39 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+root_directory = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(root_directory)
+
+
+@pytest.fixture
+def without_pyarrow(monkeypatch):
+    # A None entry in sys.modules makes `import pyarrow...` raise ImportError
+    for name in ('pyarrow', 'pyarrow.compute', 'pyarrow.dataset', 'pyarrow.parquet'):
+        monkeypatch.setitem(sys.modules, name, None)
+    monkeypatch.delitem(sys.modules, 'tweet_store', raising=False)
+    yield
+    sys.modules.pop('tweet_store', None)
+
+
+def test_tweet_store_imports_without_pyarrow(without_pyarrow):
+    import tweet_store
+    assert tweet_store.pa is None
+    with pytest.raises(ImportError, match='pyarrow'):
+        tweet_store.open_tweet_store()
+    with pytest.raises(ImportError, match='pyarrow'):
+        tweet_store.date_filter('2019-05-01')
+
+
+def test_loader_imports_without_pyarrow(without_pyarrow):
+    pytest.importorskip('pyodbc')
+    pytest.importorskip('tqdm')
+    path = os.path.join(root_directory, 'data_prep', 'completeLoading.py')
+    spec = importlib.util.spec_from_file_location('completeLoading', path)
+    loader = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(loader)
+    assert loader.pa is None
+    with pytest.raises(ImportError, match='pyarrow'):
+        loader.tweet_store_schema()
@@ -0,0 +1,150 @@
+import os
+from datetime import date
+
+# pyarrow is only needed for the Parquet tweet store
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = ds = pq = None
+
+# Day-partitioned Parquet copy of the raw tweet JSON, written by
+# `completeLoading.py --to-parquet`. Every row holds the fields produced by
+# clean_tweet_object, the cleaned user in a `user` struct and the extracted
+# entities (hashtags, mentions, polls, poll options, URLs and media) as nested
+# lists. Files live under date=YYYY-MM-DD/.
+store_directory = os.path.join(os.path.dirname(__file__), 'parquet')
+
+# Version of the store layout, kept in the schema metadata of every file. Bump it
+# whenever tweet_store_schema changes: `--to-parquet` converts the data files
+# whose store files carry another version (or none) again.
+STORE_VERSION = '2'
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("The Parquet tweet store needs pyarrow (pip install pyarrow)")
+
+def tweet_store_schema():
+    """Schema of the rows written to the store, including the `date` partition column."""
+    require_pyarrow()
+    user = pa.struct([
+        ('id', pa.int64()),
+        ('name', pa.string()),
+        ('screen_name', pa.string()),
+        ('description', pa.string()),
+        ('verified', pa.bool_()),
+        ('followers_count', pa.int64()),
+        ('friends_count', pa.int64()),
+        ('listed_count', pa.int64()),
+        ('favorites_count', pa.int64()),
+        ('status_count', pa.int64())
+    ])
+    hashtag = pa.struct([('text', pa.string()), ('start_idx', pa.int16()), ('end_idx', pa.int16())])
+    mention = pa.struct([
+        ('screen_name', pa.string()),
+        ('start_idx', pa.int16()),
+        ('end_idx', pa.int16()),
+        ('id', pa.int64())
+    ])
+    poll = pa.struct([('end_datetime', pa.timestamp('ms')), ('duration_minutes', pa.int32())])
+    poll_option = pa.struct([('position', pa.int8()), ('text', pa.string())])
+    url = pa.struct([('expanded_url', pa.string()), ('start_idx', pa.int16()), ('end_idx', pa.int16())])
+    media = pa.struct([
+        ('media_id', pa.int64()),
+        ('type', pa.string()),
+        ('media_url', pa.string()),
+        ('start_idx', pa.int16()),
+        ('end_idx', pa.int16())
+    ])
+    return pa.schema([
+        ('id', pa.int64()),
+        ('text', pa.string()),
+        ('created_at', pa.timestamp('ms')),
+        ('in_reply_to_status_id', pa.int64()),
+        ('in_reply_to_user', pa.int64()),
+        ('user_id', pa.int64()),
+        ('quoted_status_id', pa.int64()),
+        ('retweeted_id', pa.int64()),
+        ('quote_count', pa.int64()),
+        ('reply_count', pa.int64()),
+        ('retweet_count', pa.int64()),
+        ('favorite_count', pa.int64()),
+        ('possibly_sensitive', pa.bool_()),
+        ('language', pa.string()),
+        ('sentiment', pa.float64()),
+        ('user', user),
+        ('hashtags', pa.list_(hashtag)),
+        ('mentions', pa.list_(mention)),
+        ('polls', pa.list_(poll)),
+        ('poll_options', pa.list_(poll_option)),
+        ('urls', pa.list_(url)),
+        ('media', pa.list_(media)),
+        ('date', pa.date32())
+    ], metadata={'tweet_store_version': STORE_VERSION})
+
+def store_file_version(path):
+    """Store layout version a Parquet file was written with, or None for files from before versioning."""
+    require_pyarrow()
+    metadata = pq.read_schema(path).metadata or {}
+    version = metadata.get(b'tweet_store_version')
+    return version.decode() if version is not None else None
+
+def store_partitioning():
+    """Hive style partitioning on the tweet's UTC day."""
+    require_pyarrow()
+    return ds.partitioning(pa.schema([('date', pa.date32())]), flavor='hive')
+
+def open_tweet_store(directory=store_directory):
+    """Open the Parquet store as a pyarrow dataset."""
+    require_pyarrow()
+    return ds.dataset(directory, format='parquet', partitioning=store_partitioning())
+
+def date_filter(start_date=None, end_date=None):
+    """
+    Build a filter on the partition column, so days outside the range are
+    never opened. Dates are inclusive and may be date objects or 'YYYY-MM-DD'.
+
+    Returns:
+        pyarrow expression, or None when no bound is given
+    """
+    require_pyarrow()
+    expression = None
+    for bound, compare in ((start_date, '__ge__'), (end_date, '__le__')):
+        if bound is None:
+            continue
+        if isinstance(bound, str):
+            bound = date.fromisoformat(bound[:10])
+        condition = getattr(ds.field('date'), compare)(bound)
+        expression = condition if expression is None else expression & condition
+    return expression
+
+def read_tweets(columns=None, start_date=None, end_date=None, filter=None, directory=store_directory):
+    """
+    Read tweets from the store for offline analyses.
+
+    Args:
+        columns: Columns to read; only these are decoded from the files
+        start_date, end_date: Inclusive day range, applied to the partitions
+        filter: Extra pyarrow expression, pushed down to the row group statistics
+
+    Returns:
+        pyarrow.Table
+    """
+    expression = date_filter(start_date, end_date)
+    if filter is not None:
+        expression = filter if expression is None else expression & filter
+    return open_tweet_store(directory).to_table(columns=columns, filter=expression)
+
+def count_unique_tweets(start_date=None, end_date=None):
+    """Number of distinct tweet ids in the store."""
+    require_pyarrow()
+    ids = read_tweets(['id'], start_date, end_date, filter=ds.field('id').is_valid())
+    return pc.count_distinct(ids['id']).as_py()
+
+def count_mentions(user_id, start_date=None, end_date=None):
+    """Number of mentions of a user id over all tweets in the store."""
+    mentions = read_tweets(['mentions'], start_date, end_date)['mentions']
+    ids = pc.struct_field(pc.list_flatten(mentions), 'id')
+    return pc.sum(pc.equal(ids, user_id)).as_py() or 0